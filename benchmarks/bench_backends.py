@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Compare the dataframe (Todo) and records (RecordTodo) backends
+
+For each list size, this reports the memory held by the loaded list
+(measured with tracemalloc) and the time for loading and common
+operations, plus the cold-start time of a command-line edit, which
+includes importing the backend.
+
+Usage: python benchmarks/bench_backends.py [--sizes 100 1000 ...] [--repeat N]
+"""
+import os
+import io
+import sys
+import tempfile
+import argparse
+import tracemalloc
+import subprocess
+import contextlib
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+from bench_todo import write_list, best_of
+from yatl.todo import Todo
+from yatl.records import RecordTodo
+
+backends = {
+    'dataframe': Todo,
+    'records': RecordTodo,
+}
+default_sizes = [100, 1000, 10000, 100000]
+
+
+def loaded_size(cls, fpath):
+    """Memory allocated for a loaded (and sorted) list, in bytes"""
+    tracemalloc.start()
+    todo = cls(fpath)
+    todo.sort_list()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del todo
+    return size
+
+
+def bench_backend(cls, fpath, repeat):
+    results = {}
+    results['memory [MB]'] = loaded_size(cls, fpath) / 2**20
+    results['load'] = best_of(lambda: cls(fpath), repeat)
+    todo = cls(fpath)
+    results['sort_list'] = best_of(todo.sort_list, 1)
+    counter = iter(range(10**9))
+    results['add_task'] = best_of(
+        lambda: todo.add_task('new task {:d}'.format(next(counter)), 3, 2),
+        repeat)
+    # complete and delete tasks that were just added
+    labels = iter(range(todo.next_id - repeat, todo.next_id))
+    results['mark_complete'] = best_of(
+        lambda: todo.mark_complete(next(labels)), repeat)
+    labels = iter(range(todo.next_id - repeat, todo.next_id))
+    results['delete_task'] = best_of(
+        lambda: todo.delete_task(next(labels)), repeat)
+    results['review'] = best_of(todo.review, repeat)
+    todo.remove_temp()
+    return results
+
+
+def cold_edit(backend, fpath, repeat):
+    """Time a command-line edit in a fresh interpreter"""
+    cmd = [sys.executable, os.path.join(repo,'yatla.py'), fpath,
+           '--backend', backend, '--complete', '0']
+    def run():
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    def setup():
+        # start from an incomplete task every time
+        write_list(fpath, ntasks=int(os.path.basename(fpath).split('.')[0]))
+    return best_of(run, repeat, setup=setup)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=default_sizes)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print('{:8s} {:22s}'.format('tasks','measure')
+          + ''.join('{:>12s}'.format(name) for name in backends)
+          + '{:>10s}'.format('ratio'))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for ntasks in args.sizes:
+            print('Benchmarking',ntasks,'tasks...', file=sys.stderr)
+            fpath = os.path.join(tmpdir, '{:d}.csv'.format(ntasks))
+            write_list(fpath, ntasks)
+            results = {}
+            with contextlib.redirect_stdout(io.StringIO()):
+                for name,cls in backends.items():
+                    results[name] = bench_backend(cls, fpath, args.repeat)
+            for name in backends:
+                results[name]['cold edit'] = cold_edit(name, fpath,
+                                                       args.repeat)
+            for measure in results['dataframe']:
+                values = [results[name][measure] for name in backends]
+                print('{:<8d} {:22s}'.format(ntasks, measure)
+                      + ''.join('{:12.3e}'.format(v) for v in values)
+                      + '{:10.2f}'.format(values[0] / values[1]))
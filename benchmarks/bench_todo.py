@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""Benchmark Todo operations as the todo list grows
+
+Synthetic lists are generated for each size, and each operation is
+timed (best of several repeats). Results are written as JSON, so that
+runs from different commits can be compared with --compare.
+
+Usage: python benchmarks/bench_todo.py [--sizes 100 1000 ...] [--output FILE]
+                                       [--compare OLD.json] [--plot-out FILE]
+"""
+import os
+import io
+import sys
+import json
+import time
+import platform
+import tempfile
+import argparse
+import subprocess
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+from yatl.todo import Todo
+
+default_sizes = [100, 1000, 10000, 100000, 1000000]
+
+
+def write_list(fpath, ntasks, seed=0):
+    """Write a synthetic todo list in CSV format"""
+    rng = np.random.default_rng(seed)
+    importance = rng.integers(1, 5, ntasks)
+    cost = rng.integers(1, 5, ntasks)
+    created = (pd.Timestamp('2020-01-01')
+               + pd.to_timedelta(rng.integers(0, 3*365*86400, ntasks), unit='s'))
+    completed = created + pd.to_timedelta(rng.integers(0, 30*86400, ntasks),
+                                          unit='s')
+    completed = pd.Series(completed.strftime(Todo.datetime_format))
+    completed[rng.random(ntasks) < 0.5] = False
+    pd.DataFrame({
+        'datetime': created.strftime(Todo.datetime_format),
+        'description': ['synthetic task {:d}'.format(i) for i in range(ntasks)],
+        'importance': importance,
+        'cost': cost,
+        'priority': importance / cost,
+        'completed': completed,
+    }).to_csv(fpath, index=False)
+
+
+def best_of(func, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+def bench_size(ntasks, tmpdir, repeat):
+    """Time each operation for a list with `ntasks` tasks"""
+    fpath = os.path.join(tmpdir, 'bench{:d}.csv'.format(ntasks))
+    write_list(fpath, ntasks)
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        results['_read_list'] = best_of(lambda: Todo(fpath), repeat)
+        todo = Todo(fpath)
+        binpath = os.path.join(tmpdir, 'bench{:d}.yatl'.format(ntasks))
+        todo.export(binpath)
+        results['_read_list (binary)'] = best_of(lambda: Todo(binpath), repeat)
+
+        def unsort():
+            todo.df = todo.df.sample(frac=1, random_state=0)
+            todo._ordered = False
+            todo._keys = None
+        results['sort_list'] = best_of(todo.sort_list, repeat, setup=unsort)
+
+        counter = iter(range(10**9))
+        results['add_task'] = best_of(
+            lambda: todo.add_task('new task {:d}'.format(next(counter)), 3, 2),
+            repeat)
+        incomplete = iter(todo.df.index[todo.df['completed'].isna()])
+        results['mark_complete'] = best_of(
+            lambda: todo.mark_complete(next(incomplete)), repeat)
+        labels = iter(todo.df.index[::-1])
+        results['delete_task'] = best_of(
+            lambda: todo.delete_task(next(labels)), repeat)
+        results['save'] = best_of(lambda: todo.save(overwrite=True), repeat)
+        results['review'] = best_of(todo.review, repeat)
+
+        from matplotlib.figure import Figure
+        def plot():
+            fig = Figure(figsize=(10,4))
+            ax = fig.add_subplot()
+            todo.plot(fig=fig, ax=ax)
+            fig.canvas.draw()
+        results['plot'] = best_of(plot, repeat)
+
+        results['TaskList'] = bench_tasklist(todo, repeat)
+        todo.remove_temp()
+    return results
+
+
+def bench_tasklist(todo, repeat):
+    """Time construction of the GUI task list, if a display is available"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception:
+        return None
+    from yatl.gui import TaskList
+    def construct():
+        tasklist = TaskList(root, todo)
+        root.update_idletasks()
+        tasklist.destroy()
+    try:
+        return best_of(construct, repeat)
+    finally:
+        root.destroy()
+
+
+def scaling_exponent(sizes, timings):
+    """Slope of the log-log timing curve, e.g., ~1 for O(n)"""
+    points = [(n,t) for n,t in zip(sizes, timings)
+              if (t is not None) and (t > 0)]
+    if len(points) < 2:
+        return None
+    n, t = np.log(np.array(points)).T
+    return np.polyfit(n, t, 1)[0]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git','rev-parse','HEAD'], cwd=repo,
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(sizes, results, compare=None):
+    ops = list(results[str(sizes[0])])
+    width = 12 if compare is None else 18
+    header = '{:22s}'.format('operation') \
+            + ''.join('{:>{}d}'.format(n,width) for n in sizes) \
+            + '{:>8s}'.format('slope')
+    print(header)
+    for op in ops:
+        timings = [results[str(n)][op] for n in sizes]
+        line = '{:22s}'.format(op)
+        for n,t in zip(sizes, timings):
+            if t is None:
+                line += '{:>{}s}'.format('n/a',width)
+                continue
+            cell = '{:.2e}'.format(t)
+            if compare is not None:
+                old = compare.get(str(n), {}).get(op)
+                if old:
+                    cell += ' {:4.1f}x'.format(old / t)
+            line += '{:>{}s}'.format(cell,width)
+        slope = scaling_exponent(sizes, timings)
+        line += '{:>8s}'.format('' if slope is None else '{:.2f}'.format(slope))
+        print(line)
+
+
+def plot_scaling(sizes, results, fpath):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(7,5))
+    ax = fig.add_subplot()
+    for op in results[str(sizes[0])]:
+        timings = [results[str(n)][op] for n in sizes]
+        if any(t is None for t in timings):
+            continue
+        ax.loglog(sizes, timings, marker='o', label=op)
+    ax.set_xlabel('number of tasks')
+    ax.set_ylabel('time [s]')
+    ax.legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(fpath)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=default_sizes)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='bench_todo.json',
+                        help='JSON file to write results to')
+    parser.add_argument('--compare', help='JSON results from a previous run,'
+                                          ' to print speedups against')
+    parser.add_argument('--plot-out', help='Save log-log scaling curves')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for ntasks in args.sizes:
+            print('Benchmarking',ntasks,'tasks...', file=sys.stderr)
+            results[str(ntasks)] = bench_size(ntasks, tmpdir, args.repeat)
+
+    compare = None
+    if args.compare:
+        with open(args.compare) as f:
+            compare = json.load(f)['results']
+    print_table(args.sizes, results, compare)
+
+    output = {
+        'commit': git_commit(),
+        'timestamp': pd.Timestamp.now().isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'sizes': args.sizes,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print('Wrote',args.output)
+    if args.plot_out:
+        plot_scaling(args.sizes, results, args.plot_out)
+        print('Wrote',args.plot_out)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Cold-start benchmark for reviewing a todo list from the command line
+
+Each case is run in a fresh interpreter, so module import costs are
+included in the timings.
+
+Usage: python benchmarks/startup.py [--ntasks N] [--repeat R]
+"""
+import os
+import sys
+import csv
+import time
+import random
+import tempfile
+import argparse
+import subprocess
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+cases = {
+    'yatla.py review (lite reader)':
+        [os.path.join(repo,'yatla.py'), '{fpath}'],
+    'Todo.review':
+        ['-c', 'from yatl.todo import Todo; Todo("{fpath}").review()'],
+    'import pyplot (TkAgg), previously paid on every run':
+        ['-c', 'import matplotlib; matplotlib.use("TkAgg");'
+               ' import matplotlib.pyplot'],
+}
+
+
+def write_list(fpath, ntasks):
+    with open(fpath, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['datetime','description','importance','cost',
+                         'priority','completed'])
+        for i in range(ntasks):
+            importance = random.randint(1,4)
+            cost = random.randint(1,4)
+            completed = '2020-01-02 03:04:05' if (i % 3 == 0) else False
+            writer.writerow(['2020-01-01 00:00:{:02d}'.format(i % 60),
+                             'task {:d}'.format(i), importance, cost,
+                             importance/cost, completed])
+
+
+def time_case(args, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=repo, check=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    return timings[len(timings)//2]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ntasks', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fpath = os.path.join(tmpdir, 'todo.list')
+        write_list(fpath, args.ntasks)
+        for name,caseargs in cases.items():
+            caseargs = [arg.format(fpath=fpath) for arg in caseargs]
+            print('{:55s} {:8.3f} s'.format(name, time_case(caseargs, args.repeat)))
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from yatl.todo import Todo
+from yatl.records import RecordTodo
+
+
+@pytest.mark.parametrize('cls', [Todo, RecordTodo])
+def test_replay_journal(tmp_path, cls):
+    fpath = str(tmp_path / 'list.csv')
+    todo = cls(fpath, verbose=False)
+    for i in range(3):
+        todo.add_task('task {:d}'.format(i), 4, 1)
+    todo.mark_complete(0)
+    todo.delete_task(1)
+    todo = cls(fpath, verbose=False)
+    assert todo.changed
+    assert todo.get_completion_datetime(0) is not None
+    assert [line.split(' : ')[1] for line in todo.review_lines()] \
+            == ['task 0, completed ' + str(todo.get_completion_datetime(0)),
+                'task 2']
+
+
+@pytest.mark.parametrize('cls', [Todo, RecordTodo])
+def test_append_after_torn_record(tmp_path, cls):
+    fpath = str(tmp_path / 'list.csv')
+    todo = cls(fpath, verbose=False)
+    todo.add_task('before crash', 4, 1)
+    # a record torn by a crash in the middle of a write
+    with open(todo.fpath_journal, 'a') as f:
+        f.write('{"op": "delete", "lab')
+    todo = cls(fpath, verbose=False)
+    todo.add_task('after crash', 4, 1)
+    todo = cls(fpath, verbose=False)
+    descriptions = [line.split(' : ')[1] for line in todo.review_lines()]
+    assert sorted(descriptions) == ['after crash', 'before crash']
+
+
+@pytest.mark.parametrize('cls_a,cls_b', [(Todo, Todo), (Todo, RecordTodo),
+                                         (RecordTodo, Todo)])
+def test_writers_allocate_distinct_ids(tmp_path, cls_a, cls_b):
+    fpath = str(tmp_path / 'list.csv')
+    a = cls_a(fpath, verbose=False)
+    b = cls_b(fpath, verbose=False)
+    assert a.add_task('from A', 4, 1) != b.add_task('from B', 4, 1)
+    # the other writer's task is kept when compacting
+    b.save(overwrite=True)
+    a.add_task('from A again', 4, 1)
+    todo = Todo(fpath, verbose=False)
+    assert sorted(todo.df['description']) == \
+            ['from A', 'from A again', 'from B']
+    assert todo.df.index.is_unique
+
+
+def test_scheduler_compacts_large_journal(tmp_path):
+    from yatl.scheduler import SaveScheduler
+    fpath = str(tmp_path / 'list.csv')
+    todo = Todo(fpath, verbose=False)
+    saver = SaveScheduler(todo, delay=0, compact=True)
+    for i in range(3):
+        todo.add_task('task {:d}'.format(i), 4, 1)
+    saver.close()
+    assert os.path.isfile(fpath)
+    assert not os.path.isfile(todo.fpath_journal)
+    assert not todo.changed
+    todo = Todo(fpath, verbose=False)
+    assert len(todo.df) == 3
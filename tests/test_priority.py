@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from yatl.todo import Todo
+from yatl.priority import PriorityEngine, Ratio, Aging, Deadline, day
+
+
+def test_completed_tasks_do_not_gain_priority(tmp_path):
+    now = pd.Timestamp('2024-06-01').timestamp()
+    engine = PriorityEngine([Ratio(), Aging(), Deadline()],
+                            clock=lambda: now)
+    todo = Todo(str(tmp_path / 'list.csv'), priority_engine=engine,
+                verbose=False)
+    todo.add_tasks([
+        dict(description='finished due:2019-03-01', importance=4, cost=1,
+             datetime='2019-01-01 00:00:00',
+             completed='2019-02-01 00:00:00'),
+        dict(description='open', importance=2, cost=1,
+             datetime='2024-05-01 00:00:00'),
+    ])
+    todo.sort_list()
+    assert list(todo.df['description']) == ['open', 'finished due:2019-03-01']
+    assert todo.scores()[1] == 4.0
+    todo.mark_incomplete(0)
+    todo.sort_list()
+    assert todo.df.index[0] == 0
+
+
+def test_ranking_matches_full_sort():
+    rng = np.random.default_rng(0)
+    n = 100
+    created = pd.Timestamp('2024-01-01') \
+            + pd.to_timedelta(rng.integers(0, 60*86400, n), unit='s')
+    df = pd.DataFrame({
+        'datetime': created.strftime(Todo.datetime_format),
+        'description': ['task {:d}'.format(i) for i in range(n)],
+        'importance': rng.integers(1, 5, n).astype(float),
+        'priority': rng.integers(1, 5, n) / rng.integers(1, 5, n),
+        'completed': pd.NaT,
+    })
+    engine = PriorityEngine([Ratio(), Aging()])
+    now = pd.Timestamp('2024-03-01').timestamp() / day
+    coef = engine.coefficients(df, now)
+    order = Todo._rank_order(df, coef['intercept'] + coef['slope']*now)
+    coef = coef.iloc[order]
+    until = engine.next_change(coef, now)
+    # the order holds until the next change, and not for long after
+    for t in np.linspace(now, until, 5)[1:-1]:
+        score = coef['intercept'].values + coef['slope'].values*t
+        assert np.all(np.diff(score) <= 1e-9)
+    score = coef['intercept'].values + coef['slope'].values*(until + 1e-3)
+    assert np.any(np.diff(score) > 0)
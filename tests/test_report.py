@@ -0,0 +1,36 @@
+import pandas as pd
+
+from yatl.report import productivity_report, format_report
+from yatl.todo import Todo
+
+
+def make_tasks(completed):
+    n = len(completed)
+    return pd.DataFrame({
+        'datetime': ['2024-01-0{:d} 12:00:00'.format(i+1) for i in range(n)],
+        'description': ['task {:d}'.format(i) for i in range(n)],
+        'importance': [4.0, 1.0, 4.0][:n],
+        'cost': [1.0, 1.0, 4.0][:n],
+        'priority': [4.0, 1.0, 1.0][:n],
+        'completed': Todo._parse_completed(pd.Series(completed,
+                                                     dtype=object)),
+    })
+
+
+def test_report_without_completions():
+    report = productivity_report(make_tasks([False, False]))
+    assert report['summary']['completed'] == 0
+    assert report['summary']['open'] == 2
+    assert report['completed per quadrant'].values.sum() == 0
+    assert report['open per quadrant'].iloc[-1].sum() == 2
+    format_report(report)
+
+
+def test_report_completed_per_quadrant():
+    report = productivity_report(make_tasks(['2024-01-05 00:00:00', False,
+                                             '2024-01-10 00:00:00']))
+    assert report['summary']['completed'] == 2
+    assert report['completed per quadrant'].sum().to_dict() == \
+            {1: 1, 2: 1, 3: 0, 4: 0}
+    assert report['open per quadrant'].iloc[-1].to_dict() == \
+            {1: 0, 2: 0, 3: 1, 4: 0}
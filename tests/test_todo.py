@@ -0,0 +1,98 @@
+import time
+
+import pandas as pd
+
+from yatl.todo import Todo, CSVStorage
+
+
+def write_old_list(fpath, ntasks):
+    """Write a list in the format used before task ids and metadata"""
+    pd.DataFrame({
+        'datetime': ['2020-01-01 00:00:{:02d}'.format(i) for i in range(ntasks)],
+        'description': ['task {:d}'.format(i) for i in range(ntasks)],
+        'importance': [2.0] * ntasks,
+        'cost': [1.0] * ntasks,
+        'priority': [2.0] * ntasks,
+        'completed': [False] * ntasks,
+    }).to_csv(fpath, index=False)
+
+
+class SlowCSVStorage(CSVStorage):
+    """Reads small chunks slowly, so that edits happen during the load"""
+
+    def read_chunks(self, fpath, chunksize=10000):
+        for chunk in CSVStorage.read_chunks(self, fpath, 2):
+            time.sleep(0.05)
+            yield chunk
+
+
+def test_add_during_progressive_load(tmp_path):
+    fpath = str(tmp_path / 'old.csv')
+    write_old_list(fpath, 10)
+    todo = Todo(fpath, storage=SlowCSVStorage(), verbose=False,
+                progressive=True)
+    assert not todo.loaded.is_set()
+    task_id = todo.add_task('added during load', 4, 1)
+    assert task_id == 10
+    assert len(todo.df) == 11
+    assert todo.df.loc[0, 'description'] == 'task 0'
+
+
+def test_add_tasks_during_progressive_load(tmp_path):
+    fpath = str(tmp_path / 'old.csv')
+    write_old_list(fpath, 10)
+    todo = Todo(fpath, storage=SlowCSVStorage(), verbose=False,
+                progressive=True)
+    assert not todo.loaded.is_set()
+    ntasks = todo.add_tasks([dict(description='new {:d}'.format(i),
+                                  importance=1, cost=1) for i in range(3)])
+    assert ntasks == 3
+    assert len(todo.df) == 13
+    assert sorted(todo.df.index) == list(range(13))
+
+
+def test_new_list_keeps_column_types(tmp_path):
+    todo = Todo(str(tmp_path / 'new.csv'), verbose=False)
+    todo.add_task('first', 4, 1)
+    todo.sort_list()
+    todo.add_task('second', 2, 1)
+    for col,dtype in Todo.todo_columns.items():
+        assert todo.df[col].dtype == dtype
+
+
+def test_replayed_list_keeps_column_types(tmp_path):
+    fpath = str(tmp_path / 'new.csv')
+    todo = Todo(fpath, verbose=False)
+    for i in range(3):
+        todo.add_task('task {:d}'.format(i), 4, 1)
+    # reload from the change journal
+    todo = Todo(fpath, verbose=False)
+    assert len(todo.df) == 3
+    for col,dtype in Todo.todo_columns.items():
+        assert todo.df[col].dtype == dtype
+
+
+def test_add_tasks_normalizes_columns(tmp_path):
+    todo = Todo(str(tmp_path / 'new.csv'), verbose=False)
+    todo.add_tasks([pd.DataFrame({
+        'description': [42, 'text'],
+        'importance': [4, 2],
+        'cost': [1, 1],
+        'datetime': [pd.Timestamp('2020-01-02 03:04:05'), None],
+    })])
+    assert list(todo.df['description']) == ['42', 'text']
+    assert todo.df['datetime'].iloc[0] == '2020-01-02 03:04:05'
+    pd.to_datetime(todo.df['datetime'], format=todo.datetime_format)
+
+
+def test_search_archived_keeps_task_ids(tmp_path):
+    todo = Todo(str(tmp_path / 'new.csv'), verbose=False)
+    for description in ('keep me', 'archive me', 'archive me too'):
+        todo.add_task(description, 4, 1)
+    todo.mark_complete(1)
+    todo.mark_complete(2)
+    todo.df.loc[[1,2], 'completed'] = pd.Timestamp('2020-01-01')
+    assert todo.archive('1D') == 2
+    found = todo.search_archived('archive')
+    assert sorted(found.index) == [1, 2]
+    assert len(todo.search_archived('nothing')) == 0
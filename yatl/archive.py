@@ -0,0 +1,85 @@
+"""Archive of completed tasks, partitioned by month of completion
+
+Archived tasks are moved out of the todo list, so that loading, sorting,
+saving and displaying the list only deals with active work. Partitions
+are append-only CSV files in a directory next to the todo list, and
+queries only load the partitions that overlap the requested time range.
+"""
+import os
+import pandas as pd
+
+from yatl import stats
+from yatl.todo import Todo, CSVStorage
+
+
+class Archive(object):
+    """Append-only, time-partitioned store of completed tasks"""
+
+    partition_format = '%Y-%m'
+
+    def __init__(self, fpath):
+        """Open the archive belonging to the todo list at `fpath`; the
+        archive directory is created on the first append
+        """
+        pathsplit = os.path.split(fpath)
+        self.dpath = os.path.join(pathsplit[0], '.'+pathsplit[1]+'.archive')
+        self.storage = CSVStorage()
+
+    def partitions(self):
+        """Sorted list of partition keys (YYYY-MM)"""
+        try:
+            fnames = os.listdir(self.dpath)
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.splitext(fname)[0] for fname in fnames
+                      if fname.endswith('.csv'))
+
+    def partition_path(self, key):
+        return os.path.join(self.dpath, key+'.csv')
+
+    @stats.timed('archive append')
+    def append(self, df):
+        """Append completed tasks to the partitions for their completion
+        month
+        """
+        if len(df) == 0:
+            return
+        os.makedirs(self.dpath, exist_ok=True)
+        keys = df['completed'].dt.strftime(self.partition_format)
+        for key,group in df.groupby(keys, sort=True):
+            self.storage.write(group, self.partition_path(key), append=True)
+
+    def read_partition(self, key):
+        df = self.storage.read(self.partition_path(key))
+        df['completed'] = Todo._parse_completed(df['completed'])
+        return df
+
+    @stats.timed('archive query')
+    def query(self, start=None, end=None):
+        """Load archived tasks completed between `start` and `end`
+        (inclusive), reading only the partitions that overlap that range
+
+        Parameters
+        ----------
+        start, end : str or datetime-like, optional
+            Time range of task completion; unbounded by default
+        """
+        keys = self.partitions()
+        if start is not None:
+            start = pd.Timestamp(start)
+            keys = [key for key in keys
+                    if key >= start.strftime(self.partition_format)]
+        if end is not None:
+            end = pd.Timestamp(end)
+            keys = [key for key in keys
+                    if key <= end.strftime(self.partition_format)]
+        if len(keys) == 0:
+            return pd.DataFrame({col: pd.Series(dtype=dtype)
+                                 for col,dtype in Todo.todo_columns.items()})
+        # archived tasks keep their ids
+        df = pd.concat([self.read_partition(key) for key in keys])
+        if start is not None:
+            df = df.loc[df['completed'] >= start]
+        if end is not None:
+            df = df.loc[df['completed'] <= end]
+        return df
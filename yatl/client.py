@@ -0,0 +1,85 @@
+"""Client for a todo list served by `yatla.py --serve`
+
+This only depends on the standard library, so querying a running daemon
+does not pay for importing pandas or matplotlib.
+"""
+import os
+import json
+import socket
+import hashlib
+import tempfile
+
+
+def socket_path(fpath):
+    """Path of the Unix socket for the daemon serving a todo list
+
+    The socket is kept in the user's runtime directory (or the temporary
+    directory) rather than next to the list, since synced folders may not
+    support sockets and Unix socket paths are limited to about 100
+    characters. It is named by a hash of the absolute path of the list.
+    """
+    sockdir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    digest = hashlib.sha1(os.path.abspath(fpath).encode('utf-8')).hexdigest()
+    return os.path.join(sockdir, 'yatl-{:s}.sock'.format(digest[:16]))
+
+
+def request(fpath, op, timeout=10.0, **kwargs):
+    """Send a request to the daemon serving `fpath`
+
+    Returns
+    -------
+    Response dict with `ok` and `output` (or `error`) items, or None if
+    no daemon is running or it did not reply
+    """
+    try:
+        sock = _connect(fpath, timeout)
+        if sock is None:
+            return None
+        with sock:
+            sock.sendall((json.dumps(dict(op=op, **kwargs))+'\n')
+                         .encode('utf-8'))
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except OSError:
+        # e.g., timed out waiting for a busy or hung daemon
+        return None
+    try:
+        return json.loads(line.decode('utf-8'))
+    except ValueError:
+        # connection closed without a reply
+        return None
+
+
+def is_running(fpath, timeout=1.0):
+    """Whether a daemon is serving `fpath`, even if it is not responding"""
+    try:
+        sock = _connect(fpath, timeout)
+    except OSError:
+        return True
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def _connect(fpath, timeout):
+    """Connect to the daemon serving `fpath`
+
+    Returns the connected socket, or None if no daemon is running; raises
+    OSError if the daemon does not accept the connection in time
+    """
+    sockpath = socket_path(fpath)
+    if not os.path.exists(sockpath):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(sockpath)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # stale socket left by a daemon that did not shut down cleanly
+        sock.close()
+        return None
+    except OSError:
+        sock.close()
+        raise
+    return sock
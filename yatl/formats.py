@@ -0,0 +1,148 @@
+"""File and display formats shared by all todo list readers
+
+This only depends on the standard library, so that the readers that do
+not import pandas (yatl.lite and yatl.records) can share it with
+yatl.todo.
+"""
+import os
+import json
+import contextlib
+try:
+    import fcntl
+except ImportError:
+    # no file locking (e.g., on Windows), so there can only be one writer
+    fcntl = None
+
+complete_mark = '✔'
+incomplete_mark = '✘'
+datetime_format = '%Y-%m-%d %H:%M:%S'
+# start of a list in the binary storage format (see BinaryStorage)
+binary_magic = b'YATLBIN1'
+# number of tasks on the first screen of the review or GUI task list
+first_screen = 20
+# size of the change journal, relative to the snapshot, above which a
+# long-running session compacts the list
+journal_fraction = 0.1
+
+
+def read_journal(fpath):
+    """Read the records in a change journal, skipping unreadable ones"""
+    with open(fpath, 'rb') as f:
+        return _parse_records(f.read(), fpath)
+
+
+def _parse_records(data, fpath):
+    records = []
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    for lineno,line in enumerate(lines):
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # torn write at the end of the journal from a crash
+            print('Skipping unreadable journal record',lineno,
+                  'in',fpath)
+    return records
+
+
+@contextlib.contextmanager
+def locked_journal(fpath):
+    """Open a change journal for reading and appending, holding an
+    exclusive lock on it, so that other writers (in this or another
+    process) wait until it is closed
+    """
+    while True:
+        f = open(fpath, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            current = os.stat(fpath).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(f.fileno()).st_ino:
+            break
+        # rotated by a compaction while waiting for the lock
+        f.close()
+    try:
+        yield f
+    finally:
+        # also releases the lock
+        f.close()
+
+
+def read_since(f, position):
+    """Read the records appended to a locked journal since `position`,
+    the (inode, offset) at which it was last read or written, or from the
+    start if it has been replaced since
+
+    Returns
+    -------
+    Records and the position at the end of the journal
+    """
+    st = os.fstat(f.fileno())
+    offset = 0
+    if (position is not None) and (position[0] == st.st_ino) \
+            and (position[1] <= st.st_size):
+        offset = position[1]
+    f.seek(offset)
+    records = _parse_records(f.read(), f.name)
+    return records, (st.st_ino, st.st_size)
+
+
+def append_journal(f, lines):
+    """Durably append records (JSON lines) to a locked journal
+
+    If the journal ends with a record that was torn by a crash, the new
+    records start on a new line, so that they are not lost with it.
+
+    Returns
+    -------
+    Number of bytes written and the position at the end of the journal
+    """
+    data = lines.encode('utf-8')
+    if f.seek(0, os.SEEK_END) > 0:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            data = b'\n' + data
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+    return len(data), (os.fstat(f.fileno()).st_ino, f.tell())
+
+
+def read_next_id(fpath_meta):
+    """Next task id saved with the last snapshot (0 if unknown)"""
+    try:
+        with open(fpath_meta) as f:
+            return json.load(f).get('next_id', 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def journal_is_large(fpath, fpath_journal, fraction=journal_fraction):
+    """Whether the change journal has grown enough, relative to the
+    snapshot, that compacting it is cheaper than replaying it on every load
+    """
+    try:
+        size = os.path.getsize(fpath_journal)
+    except FileNotFoundError:
+        return False
+    try:
+        return size > fraction * os.path.getsize(fpath)
+    except FileNotFoundError:
+        return True
+
+
+def remove_temp_files(fpaths):
+    """Remove the temporary files with unsaved changes to a list"""
+    removed = []
+    for fpath in fpaths:
+        try:
+            os.remove(fpath)
+        except IOError:
+            pass
+        else:
+            removed.append(fpath)
+    if len(removed) == 0:
+        print('No changes')
+    else:
+        print('Cleaned up',', '.join(removed))
@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import numpy as np
 import pandas as pd
 import tkinter as tk
 import tkinter.messagebox as msg
@@ -11,13 +12,25 @@ matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
+from yatl import stats
+from yatl.scheduler import SaveScheduler
+
 default_task_charlen = 50
+max_rerank_delay = 86400 # longest wait for a ranking update, in seconds
 
 debug = False
 
 class TaskList(tk.Frame):
     """Based on:
     https://stackoverflow.com/questions/50398649/python-tkinter-tk-support-checklist-box
+
+    The list is virtualized: a fixed pool of row widgets is created once
+    and rebound to dataframe rows as the list is scrolled, so the cost of
+    updating the list does not depend on the number of tasks. Typing in
+    the filter box above the list only shows the tasks that contain all
+    of the typed words, found with the todo list's search index. While
+    the todo list is loading progressively, the highest-priority tasks
+    loaded so far are shown.
     """
     active_text_color = 'blue'
     inactive_text_color = 'black'
@@ -27,83 +40,181 @@ class TaskList(tk.Frame):
     ]
     datetime_format = '%a %m/%d %H:%M'
 
-    def __init__(self, parent, todo, **kwargs):
-        """Create a checklist from a dataframe of tasks"""
-        # TODO: implement scrolling frame
+    def __init__(self, parent, todo, nrows=20, **kwargs):
+        """Create a scrollable checklist from a dataframe of tasks
+
+        Parameters
+        ----------
+        parent : Tk widget
+        todo : yatl.todo object
+        nrows : int, optional
+            Number of visible rows
+        """
         tk.Frame.__init__(self, parent, **kwargs)
         self.todo = todo
-        self.orig_description = dict()
-        self.checkbutton = dict() # Checkbutton widgets
-        self.completed = dict() # BooleanVars
-        self.description = dict() # StringVars
-        self.removeme = dict() # Button widgets
+        self.nrows = nrows
+        self.ntasks = 0 # number of tasks shown, after filtering
+        self.shown = None # dataframe of the tasks that can be shown
+        self.first = 0 # position of the task in the first visible row
+        self.bound = [None] * nrows # task id shown in each row
+        self.row_of = dict() # visible row for each bound task id
+        # tasks completed in this session, which may still be unchecked
+        self.session_completed = set()
+        self.on_change = None # called after a task is completed or removed
+        self.rerank_id = None # pending update for when the ranking expires
+        self.checkbutton = [] # Checkbutton widgets
+        self.completed = [] # BooleanVars
+        self.description = [] # StringVars
+        self.removeme = [] # Button widgets
+        # filter box
+        self.query = tk.StringVar(value='')
+        self.filter_entry = tk.Entry(self, textvariable=self.query,
+                                     width=default_task_charlen)
+        self.filter_entry.grid(row=0, column=0, columnspan=2, sticky='ew')
+        self.query.trace_add('write', lambda *args: self.scroll_to(0, True))
+        for irow in range(nrows):
+            # Create checkbox and task description
+            var = tk.BooleanVar(value=False)
+            text = tk.StringVar(value='')
+            cb = tk.Checkbutton(self, var=var, textvar=text,
+                                onvalue=True, offvalue=False,
+                                anchor="w", width=default_task_charlen,
+                                relief="flat", highlightthickness=0,
+                                command=lambda r=irow: self.update_task_complete(self.bound[r]),
+                               )
+            # Create accompanying remove button
+            # - note that the command is not evaluated until it is clicked
+            xbutton = tk.Button(self, text=' X ',
+                                command=lambda r=irow: self.remove_row(self.bound[r]))
+            for widget in (cb, xbutton):
+                self._bind_scrolling(widget)
+            # save widgets and associated variables
+            self.checkbutton.append(cb)
+            self.completed.append(var)
+            self.description.append(text)
+            self.removeme.append(xbutton)
+        self.scrollbar = tk.Scrollbar(self, orient='vertical',
+                                      command=self.scroll)
+        self.scrollbar.grid(row=1, column=2, rowspan=nrows, sticky='ns')
+        self._bind_scrolling(self)
         self.update()
 
+    def _bind_scrolling(self, widget):
+        widget.bind('<MouseWheel>', self.on_mousewheel)
+        widget.bind('<Button-4>', lambda event: self.scroll_to(self.first-1))
+        widget.bind('<Button-5>', lambda event: self.scroll_to(self.first+1))
+
+    def on_mousewheel(self, event):
+        if event.delta > 0:
+            self.scroll_to(self.first - 1)
+        elif event.delta < 0:
+            self.scroll_to(self.first + 1)
+
+    def scroll(self, action, amount, units=None):
+        """Callback for the scrollbar"""
+        if action == 'moveto':
+            first = int(round(float(amount) * self.ntasks))
+        elif units == 'pages':
+            first = self.first + int(amount) * self.nrows
+        else:
+            first = self.first + int(amount)
+        self.scroll_to(first)
+
+    def scroll_to(self, first, force=False):
+        first = max(0, min(first, self.ntasks - self.nrows))
+        if force or (first != self.first):
+            self.first = first
+            self.update()
+
+    @stats.timed('gui TaskList update')
     def update(self):
-        """Update/create elements in task list"""
-        self.todo.sort_list()
+        """Rebind the row widgets to the visible tasks"""
+        if not self.todo.loaded.is_set():
+            df = self.todo.preview
+            self.after(100, self._poll_load)
+        elif self.query.get().strip():
+            df = self.todo.search(self.query.get())
+        else:
+            self.todo.sort_list()
+            df = self.todo.df
+        self.shown = df
+        if debug:
+            print(df[['description','priority','importance','datetime']])
+        ntasks = len(df)
+        self.ntasks = ntasks
+        self.first = max(0, min(self.first, ntasks - self.nrows))
+        self.row_of = dict()
+        for irow in range(self.nrows):
+            pos = self.first + irow
+            if pos >= ntasks:
+                self.bound[irow] = None
+                self.checkbutton[irow].grid_remove()
+                self.removeme[irow].grid_remove()
+                continue
+            idx = df.index[pos]
+            self.bound[irow] = idx
+            self.row_of[idx] = irow
+            self._update_row(irow, pos, idx)
+            self.checkbutton[irow].grid(row=irow+1, column=0)
+            self.removeme[irow].grid(row=irow+1, column=1)
+        if ntasks > 0:
+            self.scrollbar.set(self.first / ntasks,
+                               min(self.first + self.nrows, ntasks) / ntasks)
+        else:
+            self.scrollbar.set(0, 1)
+        self._schedule_rerank()
+
+    def _schedule_rerank(self):
+        """Update again once a time-dependent ranking could change"""
+        if self.rerank_id is not None:
+            self.after_cancel(self.rerank_id)
+            self.rerank_id = None
+        if not self.todo.loaded.is_set():
+            return
+        expires = self.todo.ranking_expires_in()
+        if expires < max_rerank_delay:
+            # at least a second apart, in case many tasks cross at once
+            delay = int(1000 * max(1.0, expires))
+            self.rerank_id = self.after(delay, self._rerank)
+
+    def _rerank(self):
+        self.rerank_id = None
+        self.update()
+
+    def _poll_load(self):
+        """Refresh the list until a progressive load has finished"""
+        if self.todo.loaded.is_set() and (self.shown is self.todo.preview):
+            self.update()
+            if self.on_change is not None:
+                self.on_change()
+        elif not self.todo.loaded.is_set():
+            self.update()
+
+    def _update_row(self, irow, pos, idx):
+        """Update widget properties for the task in a visible row"""
         if debug:
-            print(self.todo.df[['description','priority','importance','datetime']])
-        for irow,(idx,task) in enumerate(self.todo.df.iterrows()):
-            rowcolor = self.row_color_cycle[irow % len(self.row_color_cycle)]
-            if debug:
-                description = '(row={:d},label={:d}) {:s}'.format(
-                        irow,idx,task['description'])
-            else:
-                description = task['description']
-            completed_on = self.todo.get_completion_datetime(idx)
-            completed = (completed_on is not None)
-            if completed:
-                description += ' (completed {:s})'.format(
-                        completed_on.strftime(self.datetime_format))
-                state = 'disabled'
-                textcolor = self.inactive_text_color
-            else:
-                state = 'normal'
-                textcolor = self.active_text_color
-
-            # check whether we've already created the widget/variable
-            have_checkbutton = (idx in self.checkbutton)
-            have_completed = (idx in self.completed)
-            have_description = (idx in self.description)
-            have_removeme = (idx in self.removeme)
-            if all((have_checkbutton, have_completed, have_description,
-                    have_removeme)):
-                # update widget properties
-                if debug:
-                    print('Updating widget row',irow,'for idx',idx)
-                # update widget positions
-                self.checkbutton[idx].grid(row=irow,column=0)
-                self.removeme[idx].grid(row=irow, column=1)
-
-            else:
-                assert not any((have_checkbutton, have_completed,
-                                have_description, have_removeme))
-                # create set of widgets 
-                if debug:
-                    print('Creating widget row for idx',idx)
-                # Create checkbox and task description
-                self.orig_description[idx] = description
-                var = tk.BooleanVar(value=completed)
-                text = tk.StringVar(value=description)
-                cb = tk.Checkbutton(self, var=var, textvar=text,
-                                    onvalue=True, offvalue=False, state=state,
-                                    anchor="w", width=default_task_charlen,
-                                    fg=textcolor, background=rowcolor,
-                                    relief="flat", highlightthickness=0,
-                                    command=lambda i=idx: self.update_task_complete(i),
-                                   )
-                cb.grid(row=irow,column=0)
-                # Create accompanying remove button
-                # - note that the command is not evaluated until it is clicked
-                xbutton = tk.Button(self, text=' X ',
-                                    command=lambda i=idx: self.remove_row(i))
-                xbutton.grid(row=irow, column=1)
-                # save widgets and associated variables
-                self.checkbutton[idx] = cb
-                self.completed[idx] = var
-                self.description[idx] = text
-                self.removeme[idx] = xbutton
+            print('Updating widget row',irow,'for idx',idx)
+            description = '(row={:d},id={:d}) {:s}'.format(
+                    pos,idx,self.shown.at[idx,'description'])
+        else:
+            description = self.shown.at[idx,'description']
+        completed_on = self.shown.at[idx,'completed']
+        completed = pd.notna(completed_on)
+        if completed:
+            description += ' (completed {:s})'.format(
+                    completed_on.strftime(self.datetime_format))
+            textcolor = self.inactive_text_color
+        else:
+            textcolor = self.active_text_color
+        if completed and (idx not in self.session_completed):
+            state = 'disabled'
+        else:
+            state = 'normal'
+        rowcolor = self.row_color_cycle[pos % len(self.row_color_cycle)]
+        self.completed[irow].set(completed)
+        self.description[irow].set(description)
+        self.checkbutton[irow].config(state=state, fg=textcolor,
+                                      background=rowcolor)
 
     def update_task_complete(self, idx):
         """Callback function for when a task is checked or unchecked
@@ -112,42 +223,40 @@ class TaskList(tk.Frame):
         saved. Note that each time the checkbox is checked, the task
         completion time will be updated.
         """
-        if self.completed[idx].get() is True:
-            self.description[idx].set(
-                '{:s} (completed {:s})'.format(self.orig_description[idx],
-                                               pd.datetime.now().strftime(self.datetime_format))
-            )
-            self.checkbutton[idx].config(fg=self.inactive_text_color)
+        irow = self.row_of[idx]
+        if self.completed[irow].get() is True:
+            self.session_completed.add(idx)
             self.todo.mark_complete(idx)
         else:
-            self.description[idx].set(self.orig_description[idx])
-            self.checkbutton[idx].config(fg=self.active_text_color)
-            self.todo.df.loc[idx,'completed'] = False
+            self.todo.mark_incomplete(idx)
+        self.update()
+        if self.on_change is not None:
+            self.on_change()
 
     def remove_row(self, idx):
         """Remove task from list"""
-        if self.completed[idx].get() is False:
+        if self.todo.get_completion_datetime(idx) is None:
             # confirm delete for incomplete task
             if not msg.askyesno('Delete task', 'Delete incomplete task?'):
                 return
         if debug:
-            print('Remove task',idx,':',self.description[idx].get())
-        self.checkbutton[idx].grid_forget()
-        self.removeme[idx].grid_forget()
-        # get rid of the old widgets/variables
-        self.checkbutton.pop(idx)
-        self.completed.pop(idx)
-        self.description.pop(idx)
-        self.removeme.pop(idx)
+            print('Remove task',idx,':',self.todo.df.loc[idx,'description'])
+        self.session_completed.discard(idx)
         # update dataframe
         self.todo.delete_task(idx)
         # update task list
         self.update()
+        if self.on_change is not None:
+            self.on_change()
 
 
 class TaskPlot(tk.Frame):
     """Based on:
     https://matplotlib.org/3.1.0/gallery/user_interfaces/embedding_in_tk_sgskip.html
+
+    The quadrant decorations are drawn once; tasks are drawn as one
+    animated scatter collection per completion state, whose offsets are
+    updated in place and blitted over a cached background.
     """
 
     def __init__(self, parent, todo, figsize=(2.5,2.5), **kwargs):
@@ -156,9 +265,20 @@ class TaskPlot(tk.Frame):
         self.todo = todo
         # Make the plot
         self.fig, self.ax = plt.subplots(figsize=figsize)
-        self.update()
+        self.todo.plot_background(self.ax)
+        self.fig.tight_layout()
+        self.collections = [
+            self.ax.scatter([], [], marker=r'${:s}$'.format(mark),
+                            color=color, animated=True)
+            for mark,color in self.todo.plot_styles
+        ]
+        # offsets to prevent tasks from perfectly overlapping on plot,
+        # kept for each task id so that points do not jump around
+        self.offsets = pd.DataFrame(columns=['x','y'], dtype=float)
         # Create the canvas, a tk.DrawingArea
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
+        self.background = None
+        self.canvas.mpl_connect('draw_event', self.on_draw)
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(side=tk.LEFT)
         # Shift the plot to the left slightly so that it looks more centered
@@ -166,9 +286,36 @@ class TaskPlot(tk.Frame):
         spacer = tk.Frame(self, width=40, bg=bg) 
         spacer.pack(side=tk.LEFT)
  
+    def on_draw(self, event):
+        """Cache the static background after a full redraw (e.g., after
+        resizing), then draw the tasks on top of it
+        """
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.update()
+
+    @stats.timed('gui TaskPlot update')
     def update(self):
-        self.ax.cla()
-        self.todo.plot(fig=self.fig, ax=self.ax, legend=False)
+        """Update task positions and redraw only the task markers"""
+        df = self.todo.df
+        offsets = self.offsets.reindex(df.index)
+        new = offsets['x'].isna().values
+        if np.any(new):
+            offsets.loc[new,'x'] = self.todo._plot_offset(np.count_nonzero(new))
+            offsets.loc[new,'y'] = self.todo._plot_offset(np.count_nonzero(new))
+        self.offsets = offsets
+        xloc = df['cost'].values.astype(float) + offsets['x'].values
+        yloc = df['importance'].values.astype(float) + offsets['y'].values
+        done = df['completed'].notna().values
+        for state,collection in enumerate(self.collections):
+            select = (done == state)
+            collection.set_offsets(np.column_stack((xloc[select],
+                                                    yloc[select])))
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        for collection in self.collections:
+            self.ax.draw_artist(collection)
+        self.canvas.blit(self.ax.bbox)
 
 
 class TaskCreator(tk.Frame):
@@ -248,9 +395,13 @@ class YATLApp(object):
         """
         self.master = master
         self.todo = todo
+        # save edits from a worker thread, so that a slow YATL_PATH does
+        # not block the GUI
+        self.saver = SaveScheduler(self.todo)
         tasklist = TaskList(master, self.todo)
         taskplot = TaskPlot(master, self.todo)
         taskctrl = TaskCreator(master, self.todo, tasklist, taskplot)
+        tasklist.on_change = taskplot.update
         tasklist.pack()
         taskplot.pack()
         taskctrl.pack()
@@ -258,6 +409,8 @@ class YATLApp(object):
         self.master.protocol('WM_DELETE_WINDOW', self.onclose)
 
     def onclose(self):
+        # wait for any in-flight save
+        self.saver.flush()
         if self.todo.changed is True:
             action = msg.askyesnocancel('Quit', 'Save todo list?')
             if action is True:
@@ -268,6 +421,7 @@ class YATLApp(object):
             action = True
         if action is not None:
             # clean exit
+            self.saver.close()
             self.master.quit()      # stops mainloop
             self.master.destroy()   # this is necessary on Windows to prevent
                                     # Fatal Python Error: PyEval_RestoreThread: NULL tstate
@@ -277,7 +431,9 @@ if __name__ == '__main__':
     from yatla import YATL_PATH
     from yatl.todo import Todo
 
-    todo = Todo(YATL_PATH)
+    stats.configure_from_env()
+
+    todo = Todo(YATL_PATH, progressive=True)
 
     root = tk.Tk()
     root.title('Yet Another Todo List')
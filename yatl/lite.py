@@ -0,0 +1,130 @@
+"""Lightweight todo list reader that only depends on the standard library
+
+The default review in yatla.py only prints text, so it does not need to
+pay for importing pandas. This reader produces the same output as
+`Todo.review` for a list that has been properly saved; lists with unsaved
+changes (a temporary file or change journal) are left to `Todo`, which
+knows how to recover them, as are lists in the binary storage format.
+"""
+import os
+import csv
+import json
+import heapq
+import itertools
+
+from yatl import stats
+from yatl.formats import complete_mark, binary_magic, first_screen
+
+
+def can_review(fpath):
+    """Whether the list can be reviewed without loading a Todo object"""
+    if os.path.isdir(fpath):
+        return False
+    pathsplit = os.path.split(fpath)
+    fpath_tmp = os.path.join(pathsplit[0], '.'+pathsplit[1])
+    for suffix in ('', '.journal', '.journal.compacting'):
+        if os.path.isfile(fpath_tmp+suffix):
+            return False
+    try:
+        with open(fpath, 'rb') as f:
+            if f.read(len(binary_magic)) == binary_magic:
+                return False
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def is_ordered(fpath):
+    """Whether the list was saved in sorted order (see Todo.compact)"""
+    pathsplit = os.path.split(fpath)
+    fpath_meta = os.path.join(pathsplit[0], '.'+pathsplit[1]+'.meta')
+    try:
+        with open(fpath_meta) as f:
+            return json.load(f).get('ordered', False)
+    except (FileNotFoundError, ValueError):
+        return False
+
+
+@stats.timed('parse')
+def read_tasks(fpath):
+    """Read the tasks as a list of (row, row dict) tuples, sorted the
+    same way as Todo.sort_list
+    """
+    try:
+        with open(fpath, newline='') as f:
+            tasks = list(enumerate(csv.DictReader(f)))
+    except FileNotFoundError:
+        return []
+    tasks.sort(key=_sort_key)
+    return tasks
+
+
+def _sort_key(item):
+    i, task = item
+    return (-float(task['priority']), -float(task['importance']),
+            task['datetime'], i)
+
+
+def completion_datetime(task):
+    completed = task['completed']
+    if completed in ('', 'False'):
+        return None
+    return completed
+
+
+def task_id(i, task):
+    """Task id, which is the row in the file for lists written before
+    tasks had ids
+    """
+    return int(task.get('id', i))
+
+
+def format_lines(tasks):
+    lines = []
+    for i,task in tasks:
+        completed_on = completion_datetime(task)
+        if completed_on is None:
+            lines.append('[ ] {:d} : {:s}'.format(task_id(i, task),
+                                                  task['description']))
+        else:
+            lines.append('[{:s}] {:d} : {:s}, completed {:s}'.format(
+                    complete_mark, task_id(i, task), task['description'],
+                    completed_on))
+    return lines
+
+
+@stats.timed('render review')
+def review(fpath):
+    """Print the todo list, sorted by priority and importance"""
+    print('Todo list:',fpath)
+    if is_ordered(fpath):
+        # print the first screen while the rest of the list is read
+        try:
+            with open(fpath, newline='') as f:
+                tasks = enumerate(csv.DictReader(f))
+                for n in (first_screen, None):
+                    lines = format_lines(itertools.islice(tasks, n))
+                    if len(lines) > 0:
+                        print('\n'.join(lines), flush=True)
+        except FileNotFoundError:
+            pass
+        return
+    lines = format_lines(read_tasks(fpath))
+    if len(lines) > 0:
+        print('\n'.join(lines))
+
+
+@stats.timed('top')
+def top(fpath, n):
+    """Print the `n` highest-priority incomplete tasks, selected with a
+    heap instead of sorting the whole list
+    """
+    try:
+        with open(fpath, newline='') as f:
+            tasks = [(i,task) for i,task in enumerate(csv.DictReader(f))
+                     if completion_datetime(task) is None]
+    except FileNotFoundError:
+        return
+    lines = format_lines(heapq.nsmallest(n, tasks, key=_sort_key))
+    if len(lines) > 0:
+        print('\n'.join(lines))
@@ -0,0 +1,121 @@
+"""Plots of tasks on time commitment vs importance axes, shared by Todo
+and RecordTodo
+
+This only depends on numpy, and imports matplotlib on demand, so that
+plotting a RecordTodo does not import pandas.
+"""
+import numpy as np
+
+from yatl.formats import complete_mark, incomplete_mark
+
+# (marker, color) for incomplete and completed tasks
+plot_styles = [(incomplete_mark,'r'), (complete_mark,'g')]
+plot_density_threshold = 1000
+legend_max = 15
+
+
+def import_pyplot():
+    """Import pyplot on demand, so that reviewing the list does not pay
+    for loading matplotlib and Tk
+    """
+    # to avoid NSException when initializing Tkinter gui
+    # (see https://github.com/MTG/sms-tools/issues/29)
+    # - matplotlib.use() should come before the matplotlib.pyplot import
+    import matplotlib
+    matplotlib.use('TkAgg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_offset(value_minmax, size, frac=0.05, rng=None):
+    """Random offsets that prevent tasks from perfectly overlapping"""
+    maxdisp = frac * (value_minmax[1] - value_minmax[0])
+    if rng is None:
+        return maxdisp * (2*np.random.random_sample(size) - 1)
+    return maxdisp * (2*rng.random(size) - 1)
+
+
+def plot_tasks(ax, cost, importance, done, value_minmax, styles=plot_styles,
+               density_threshold=plot_density_threshold, rng=None):
+    """Draw tasks as one scatter collection per completion state or,
+    above `density_threshold` tasks, as the number of tasks per cell
+    """
+    if len(cost) > density_threshold:
+        plot_density(ax, cost, importance, done, styles)
+        return
+    xloc = cost + plot_offset(value_minmax, len(cost), rng=rng)
+    yloc = importance + plot_offset(value_minmax, len(importance), rng=rng)
+    for state,(mark,color) in enumerate(styles):
+        select = (done == state)
+        ax.scatter(xloc[select], yloc[select],
+                   marker=r'${:s}$'.format(mark), color=color)
+
+
+def plot_density(ax, cost, importance, done, styles=plot_styles,
+                 shift=0.15):
+    """Draw the number of tasks per cell, with incomplete and completed
+    tasks side by side
+    """
+    cells = np.stack([np.rint(cost), np.rint(importance)], axis=1)
+    for state,(mark,color) in enumerate(styles):
+        select = (done == state)
+        if not np.any(select):
+            continue
+        centers, counts = np.unique(cells[select], axis=0,
+                                    return_counts=True)
+        xloc = centers[:,0] + (2*state - 1)*shift
+        yloc = centers[:,1]
+        ax.scatter(xloc, yloc, s=36 + 164*counts/counts.max(),
+                   marker=r'${:s}$'.format(mark), color=color)
+        for x,y,count in zip(xloc, yloc, counts):
+            ax.annotate(str(count), (x,y), xytext=(0,-14),
+                        textcoords='offset points', color=color,
+                        fontsize='small', horizontalalignment='center')
+
+
+def plot_background(ax, value_minmax):
+    """Draw the static parts of the plot: quadrant lines and labels,
+    axis limits, ticks and labels
+    """
+    expanded_range = (value_minmax[0] - 0.25,
+                      value_minmax[1] + 0.25)
+    value_split = np.mean(value_minmax)
+    ax.axhline(value_split, ls='-', color='k')
+    ax.axvline(value_split, ls='-', color='k')
+    bkg_props = {
+        'color': '0.7',
+        'fontfamily': 'sans-serif',
+        'fontsize': 'xx-large',
+        'horizontalalignment': 'left',
+        'verticalalignment': 'top',
+        'transform': ax.transAxes,
+    }
+    ax.text(0.05, 0.95, '1', **bkg_props)
+    ax.text(0.55, 0.95, '2', **bkg_props)
+    ax.text(0.05, 0.45, '3', **bkg_props)
+    ax.text(0.55, 0.45, '4', **bkg_props)
+    ax.set_xlim(expanded_range)
+    ax.set_ylim(expanded_range)
+    ax.set_xticks(value_minmax, minor=False)
+    ax.set_yticks(value_minmax, minor=False)
+    ax.set_xticklabels(['-','+'])
+    ax.set_yticklabels(['-','+'])
+    ax.set_xlabel('time commitment')
+    ax.set_ylabel('importance')
+
+
+def legend_entries(done, labels, nmore, styles=plot_styles):
+    """Create legend handles for the tasks with the given completion
+    states and labels, noting how many more tasks were left out
+    """
+    from matplotlib.lines import Line2D
+    handles = [
+        Line2D([], [], ls='none', marker=r'${:s}$'.format(mark),
+               color=color)
+        for mark,color in (styles[state] for state in done)
+    ]
+    labels = list(labels)
+    if nmore > 0:
+        handles.append(Line2D([], [], ls='none'))
+        labels.append('... and {:d} more'.format(nmore))
+    return handles, labels
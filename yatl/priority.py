@@ -0,0 +1,184 @@
+"""Pluggable priority scores for ranking tasks
+
+A `PriorityEngine` scores tasks as a sum of terms. Each term is linear in
+time between breakpoints, so the engine can describe every task's score
+by an intercept and a slope (in days) that are valid until the next
+breakpoint. These coefficients are cached by `Todo`. The ranking only has
+to be recomputed once a breakpoint passes or two tasks' scores cross.
+The first change in the order of a set of lines is always a crossing of
+two neighbors in the current order, so the time of the next possible
+change is found with a single vectorized pass over the ranked tasks.
+
+The default engine scores tasks by the ratio of importance to cost (the
+stored `priority` column), which never changes over time. The
+time-dependent terms do not apply to completed tasks.
+"""
+import time
+import numpy as np
+import pandas as pd
+
+day = 86400.0 # seconds
+
+
+class Ratio(object):
+    """Importance / cost, as stored in the priority column"""
+    dynamic = False
+
+    def coefficients(self, df, now):
+        """Intercept, slope and end of validity of the term for each task,
+        with time in days since the epoch
+        """
+        n = len(df)
+        return (df['priority'].values.astype(float), np.zeros(n),
+                np.full(n, np.inf))
+
+
+class Aging(object):
+    """Score that grows with the age of a task, so that neglected tasks
+    eventually rise to the top
+
+    Parameters
+    ----------
+    rate : float, optional
+        Increase in score per day
+    weighted : bool, optional
+        Scale the rate by the importance of each task, so that important
+        tasks age faster
+    """
+    dynamic = True
+
+    def __init__(self, rate=0.05, weighted=True):
+        self.rate = rate
+        self.weighted = weighted
+
+    def coefficients(self, df, now):
+        created = _days(df['datetime'])
+        # tasks without a creation time are not aged
+        slope = np.where(_open(df) & ~np.isnan(created), self.rate, 0.0)
+        if self.weighted:
+            slope = slope * df['importance'].values.astype(float)
+        return -slope*np.nan_to_num(created), slope, np.full(len(df), np.inf)
+
+
+class Deadline(object):
+    """Score that ramps up over the `horizon` before a deadline, and
+    keeps growing once the task is overdue
+
+    Deadlines are given in the task description with a tag like
+    `due:2020-12-31`.
+
+    Parameters
+    ----------
+    weight : float, optional
+        Increase in score over the horizon
+    horizon : float, optional
+        Number of days before the deadline that the ramp starts
+    """
+    dynamic = True
+    pattern = r'\bdue:(\d{4}-\d{2}-\d{2})'
+
+    def __init__(self, weight=2.0, horizon=7.0):
+        self.weight = weight
+        self.horizon = horizon
+
+    def coefficients(self, df, now):
+        deadline = _days(df['description'].str.extract(self.pattern,
+                                                       expand=False))
+        # completed tasks are treated like tasks without a deadline
+        deadline[~_open(df)] = np.nan
+        start = deadline - self.horizon
+        rate = self.weight / self.horizon
+        ramping = start <= now
+        intercept = np.where(ramping, -rate*start, 0.0)
+        slope = np.where(ramping, rate, 0.0)
+        # tasks without a deadline have a NaN start
+        until = np.where(ramping | np.isnan(start), np.inf, start)
+        return intercept, slope, until
+
+
+def _open(df):
+    """Mask of tasks that are not completed"""
+    return df['completed'].isna().values
+
+
+def _days(datetimes):
+    """Convert datetime strings to days since the epoch (NaN if missing)"""
+    datetimes = pd.to_datetime(datetimes, errors='coerce').values
+    days = datetimes.astype('datetime64[s]').astype(float) / day
+    days[np.isnat(datetimes)] = np.nan
+    return days
+
+
+class PriorityEngine(object):
+    """Sum of priority terms
+
+    Parameters
+    ----------
+    terms : list, optional
+        Priority terms, e.g., [Ratio(), Aging()]; the ratio of importance
+        to cost by default
+    clock : callable, optional
+        Current time in seconds since the epoch
+    """
+
+    def __init__(self, terms=None, clock=time.time):
+        if terms is None:
+            terms = [Ratio()]
+        self.terms = terms
+        self.clock = clock
+
+    @property
+    def dynamic(self):
+        """Whether scores change over time"""
+        return any(term.dynamic for term in self.terms)
+
+    def now(self):
+        return self.clock() / day
+
+    def coefficients(self, df, now):
+        """Intercept, slope and end of validity of the total score for
+        each task (see Ratio.coefficients)
+        """
+        intercept = np.zeros(len(df))
+        slope = np.zeros(len(df))
+        until = np.full(len(df), np.inf)
+        for term in self.terms:
+            a, b, valid = term.coefficients(df, now)
+            # tasks without a value for a term are not scored by it
+            intercept += np.nan_to_num(a)
+            slope += np.nan_to_num(b)
+            until = np.minimum(until, valid)
+        return pd.DataFrame({'intercept': intercept, 'slope': slope,
+                             'until': until}, index=df.index)
+
+    def next_change(self, coef, now):
+        """Earliest time at which the order of the ranked tasks (highest
+        score first) could change
+
+        Parameters
+        ----------
+        coef : pandas.DataFrame
+            Coefficients of the tasks in ranked order
+        now : float
+            Current time, in days since the epoch
+        """
+        if len(coef) == 0:
+            return np.inf
+        expires = coef['until'].values.min()
+        score = coef['intercept'].values + coef['slope'].values*now
+        gap = score[:-1] - score[1:]
+        closing = coef['slope'].values[1:] - coef['slope'].values[:-1]
+        crossing = closing > 0
+        if np.any(crossing):
+            crossover = now + (gap[crossing] / closing[crossing]).min()
+            return min(expires, crossover)
+        return expires
+
+
+#: engines that can be selected by name, e.g., from the command line
+priority_engines = {
+    'ratio': lambda: PriorityEngine(),
+    'aging': lambda: PriorityEngine([Ratio(), Aging()]),
+    'deadline': lambda: PriorityEngine([Ratio(), Deadline()]),
+    'aging+deadline': lambda: PriorityEngine([Ratio(), Aging(), Deadline()]),
+}
@@ -0,0 +1,409 @@
+"""Todo list kept as a list of compact task records instead of a dataframe
+
+`RecordTodo` supports the common operations of `yatl.todo.Todo` (adding,
+completing and deleting tasks, sorting, reviewing and plotting) without
+importing pandas, which dominates the run time of a command-line edit
+for small and medium lists. Tasks are `__slots__` records with interned
+descriptions, indexed by id in a dict, so point operations are O(1).
+
+Lists are read and written in the same CSV format as `Todo`, with the
+same change journal, so either class can pick up where the other left
+off. Binary (.yatl) lists, imports, archiving and search still need
+`Todo`.
+"""
+import os
+import csv
+import sys
+import json
+import heapq
+import bisect
+import time
+import contextlib
+
+from yatl import stats
+from yatl.formats import complete_mark, datetime_format, binary_magic, \
+        read_journal, locked_journal, read_since, append_journal, \
+        read_next_id, remove_temp_files
+
+task_fields = ('datetime', 'description', 'importance', 'cost',
+               'priority', 'completed')
+
+
+class Task(object):
+    """Single task, with the completion datetime as a string (or None
+    for an incomplete task)
+    """
+    __slots__ = ('id',) + task_fields
+
+    def __init__(self, task_id, datetime, description, importance, cost,
+                 priority, completed=None):
+        self.id = task_id
+        self.datetime = datetime
+        self.description = sys.intern(description)
+        self.importance = float(importance)
+        self.cost = float(cost)
+        self.priority = float(priority)
+        self.completed = _parse_completed(completed)
+
+    def sort_key(self):
+        # same order as Todo.sort_list
+        return (-self.priority, -self.importance, self.datetime)
+
+
+def _parse_completed(completed):
+    """Completion datetime string, or None for incomplete tasks (stored
+    as False, or missing values in journal records)
+    """
+    if (not isinstance(completed, str)) or (completed in ('', 'False')):
+        return None
+    return completed
+
+
+class RecordTodo(object):
+    """Todo list stored as a sorted list of task records"""
+
+    def __init__(self, fpath, value_minmax=(1,4), journal=True, verbose=True):
+        """Load a todo list from the specified CSV file
+
+        Parameters
+        ----------
+        fpath : str
+            Path to todo list
+        value_minmax : list or tuple, optional
+            Minimum/maximum values for importance and cost
+        journal : bool, optional
+            If True, edits are appended to the change journal next to
+            `fpath`; otherwise, the whole list is written to the
+            temporary file after every edit
+        verbose : bool, optional
+            Print the path of the todo list when loading it
+        """
+        self.fpath = fpath
+        self.value_minmax = value_minmax
+        self.journal = journal
+        self.verbose = verbose
+        self.changed = False
+        self._pending = [] # journal records not yet written
+        self._read_list()
+
+    @stats.timed('load')
+    def _read_list(self):
+        if self.verbose:
+            print('Todo list:',self.fpath)
+        pathsplit = os.path.split(self.fpath)
+        self.fpath_tmp = os.path.join(pathsplit[0], '.'+pathsplit[1])
+        self.fpath_journal = self.fpath_tmp + '.journal'
+        self.fpath_meta = self.fpath_tmp + '.meta'
+        self.tasks = [] # in sorted order, once _ordered is set
+        self.by_id = dict()
+        self._ordered = False
+        self._keys = None # sort keys of the ordered tasks
+        self.next_id = read_next_id(self.fpath_meta)
+        # (inode, offset) up to which the journal has been read or written
+        self._journal_pos = None
+        # recover changes from a session that was not properly saved
+        if os.path.isfile(self.fpath_tmp):
+            print('Recovering unsaved changes from',self.fpath_tmp)
+            self._read_csv(self.fpath_tmp)
+            self.changed = True
+        else:
+            self._read_csv(self.fpath)
+        for fpath in (self.fpath_journal+'.compacting', self.fpath_journal):
+            if os.path.isfile(fpath):
+                print('Replaying unsaved changes from',fpath)
+                if fpath == self.fpath_journal:
+                    st = os.stat(fpath)
+                    self._journal_pos = (st.st_ino, st.st_size)
+                with stats.timer('replay journal'):
+                    for rec in read_journal(fpath):
+                        self._apply(rec)
+                self.changed = True
+
+    @stats.timed('parse')
+    def _read_csv(self, fpath):
+        try:
+            with open(fpath, 'rb') as f:
+                if f.read(len(binary_magic)) == binary_magic:
+                    raise IOError(fpath+' is a binary todo list, which'
+                                  ' needs yatl.todo.Todo')
+            with open(fpath, newline='') as f:
+                for i,row in enumerate(csv.DictReader(f)):
+                    # lists written before tasks had ids use file order
+                    task_id = int(row.get('id', i))
+                    self._put(Task(task_id, *(row[field]
+                                              for field in task_fields)))
+        except FileNotFoundError:
+            pass
+
+    def _put(self, task):
+        """Add or replace a task"""
+        if task.id in self.by_id:
+            self._remove(task.id)
+        self.by_id[task.id] = task
+        self.next_id = max(self.next_id, task.id + 1)
+        if self._ordered:
+            key = task.sort_key()
+            pos = bisect.bisect_right(self._keys, key)
+            self._keys.insert(pos, key)
+            self.tasks.insert(pos, task)
+        else:
+            self.tasks.append(task)
+
+    def _remove(self, task_id):
+        task = self.by_id.pop(task_id, None)
+        if task is None:
+            return
+        if self._ordered:
+            # bisect to the run of tasks with the same sort key
+            key = task.sort_key()
+            pos = bisect.bisect_left(self._keys, key)
+            while self.tasks[pos] is not task:
+                pos += 1
+            del self._keys[pos]
+            del self.tasks[pos]
+        else:
+            self.tasks.remove(task)
+
+    def _apply(self, rec):
+        """Apply a single journal record (see Todo._apply)"""
+        op = rec['op']
+        i = rec.get('label')
+        if op == 'add':
+            task = rec['task']
+            self._put(Task(i, *(task[field] for field in task_fields)))
+        elif op == 'delete':
+            self._remove(i)
+        elif op == 'extend':
+            columns = rec['tasks']
+            for j,values in enumerate(zip(*(columns[field]
+                                             for field in task_fields))):
+                self._put(Task(i+j, *values))
+        elif op == 'archive':
+            for label in rec['labels']:
+                self._remove(label)
+        elif op == 'complete':
+            self.by_id[i].completed = rec['completed']
+        elif op == 'incomplete':
+            self.by_id[i].completed = None
+        else:
+            raise ValueError('Unknown journal operation: '+str(op))
+
+    def _record(self, op, label=None, **kwargs):
+        """Apply an edit and save it; a new task (without a label) gets
+        the next id, which is allocated while holding the journal lock
+        """
+        stats.count('edits')
+        with self._journal_session():
+            if label is None:
+                label = self.next_id
+            rec = dict(op=op, label=int(label), **kwargs)
+            self._apply(rec)
+            self._pending.append(rec)
+        self.save()
+        return rec['label']
+
+    @contextlib.contextmanager
+    def _journal_session(self):
+        """Hold the lock on the change journal, then append the pending
+        edits to it (see Todo._journal_session)
+        """
+        if not self.journal:
+            yield
+            return
+        with locked_journal(self.fpath_journal) as f:
+            self._sync_journal(f)
+            yield
+            self._append_pending(f)
+
+    def _sync_journal(self, f):
+        """Apply the edits that other processes wrote to the locked
+        journal `f` (see Todo._sync_journal)
+        """
+        records, self._journal_pos = read_since(f, self._journal_pos)
+        if len(records) > 0:
+            for rec in records + self._pending:
+                self._apply(rec)
+        self.next_id = max(self.next_id, read_next_id(self.fpath_meta))
+
+    def _append_pending(self, f):
+        pending, self._pending = self._pending, []
+        if len(pending) == 0:
+            return
+        lines = ''.join(json.dumps(rec)+'\n' for rec in pending)
+        nbytes, self._journal_pos = append_journal(f, lines)
+        stats.count('bytes written', nbytes)
+
+    @stats.timed('sort')
+    def sort_list(self):
+        """Sort tasks by descending priority and importance, then by
+        creation time; afterwards, tasks are kept in order as they are
+        added
+        """
+        if self._ordered:
+            return
+        self.tasks.sort(key=Task.sort_key)
+        self._keys = [task.sort_key() for task in self.tasks]
+        self._ordered = True
+
+    @stats.timed('save')
+    def save(self, overwrite=False):
+        """Save the todo list, either by appending pending edits to the
+        change journal or, with `overwrite`, by writing a new snapshot
+        """
+        if overwrite:
+            self.compact()
+            print('Saved',self.fpath)
+            return
+        self.changed = True
+        if self.journal:
+            if len(self._pending) > 0:
+                with self._journal_session():
+                    pass
+        else:
+            self._write_csv(self.fpath_tmp)
+
+    def compact(self):
+        """Write all changes to a new snapshot at `fpath`"""
+        # other writers wait until the journal is removed, and their edits
+        # are included
+        with self._journal_session():
+            self.sort_list()
+            self._pending = []
+            fpath_new = self.fpath_tmp + '.snapshot'
+            with stats.timer('write snapshot'):
+                self._write_csv(fpath_new)
+            os.replace(fpath_new, self.fpath)
+            with open(self.fpath_meta, 'w') as f:
+                json.dump(dict(next_id=self.next_id, ordered=True), f)
+            for fpath in (self.fpath_journal,
+                          self.fpath_journal+'.compacting', self.fpath_tmp):
+                if os.path.isfile(fpath):
+                    os.remove(fpath)
+        self.changed = False
+
+    def _write_csv(self, fpath):
+        with open(fpath, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('id',) + task_fields)
+            for task in self.tasks:
+                writer.writerow((task.id, task.datetime, task.description,
+                                 task.importance, task.cost, task.priority,
+                                 task.completed or False))
+        stats.count('bytes written', os.path.getsize(fpath))
+
+    def remove_temp(self):
+        """Discard unsaved changes"""
+        self._pending = []
+        remove_temp_files([self.fpath_tmp, self.fpath_journal])
+
+    def add_task(self, description, importance, cost):
+        """Add a new task at the current time (see Todo.add_task)
+
+        Returns
+        -------
+        Id of the new task
+        """
+        newtask = {
+            'datetime': time.strftime(datetime_format),
+            'description': description,
+            'importance': importance,
+            'cost': cost,
+            'priority': importance / cost,
+            'completed': False,
+        }
+        return self._record('add', task=newtask)
+
+    def get_completion_datetime(self, i):
+        return self.by_id[i].completed
+
+    def delete_task(self, i):
+        """Delete task"""
+        if i not in self.by_id:
+            raise KeyError(i)
+        self._record('delete', i)
+
+    def mark_complete(self, i):
+        """Mark task as completed with the current datetime"""
+        task = self.by_id[i]
+        if task.completed is None:
+            self._record('complete', i,
+                         completed=time.strftime(datetime_format))
+        else:
+            print('Task',i,'already completed:',task.description)
+
+    def mark_incomplete(self, i):
+        """Clear the completion datetime of a task"""
+        if i not in self.by_id:
+            raise KeyError(i)
+        self._record('incomplete', i)
+
+    @stats.timed('top')
+    def top(self, n, include_completed=False):
+        """Return the `n` highest-priority tasks, selected with a heap"""
+        if self._ordered:
+            tasks = (task for task in self.tasks
+                     if include_completed or (task.completed is None))
+            return [task for _,task in zip(range(n), tasks)]
+        indexed = ((i,task) for i,task in enumerate(self.tasks)
+                   if include_completed or (task.completed is None))
+        return [task for i,task in heapq.nsmallest(
+                n, indexed, key=lambda item: (item[1].sort_key(), item[0]))]
+
+    @stats.timed('render review')
+    def review(self):
+        """Print the current todo list, sorted by priority and
+        importance
+        """
+        lines = self.review_lines()
+        if len(lines) > 0:
+            print('\n'.join(lines))
+
+    def review_lines(self, tasks=None):
+        """Format all tasks (or the given tasks) for review"""
+        if tasks is None:
+            self.sort_list()
+            tasks = self.tasks
+        return [self._task_line(task) for task in tasks]
+
+    def _task_line(self, task, checkbox=True):
+        if task.completed is None:
+            line = '{:d} : {:s}'.format(task.id, task.description)
+            mark = ' '
+        else:
+            line = '{:d} : {:s}, completed {:s}'.format(
+                    task.id, task.description, task.completed)
+            mark = complete_mark
+        if checkbox:
+            line = '[{:s}] '.format(mark) + line
+        return line
+
+    @stats.timed('render plot')
+    def plot(self, fig=None, ax=None, legend=True):
+        """Make a scatterplot of the current tasks on time vs importance
+        axes, in the same style as Todo.plot
+        """
+        import numpy as np
+        from yatl import plotting
+        showplot = False
+        if (fig is None) or (ax is None):
+            showplot = True
+            plt = plotting.import_pyplot()
+            fig,ax = plt.subplots(figsize=(10,4))
+        self.sort_list()
+        cost = np.array([task.cost for task in self.tasks])
+        importance = np.array([task.importance for task in self.tasks])
+        done = np.array([task.completed is not None for task in self.tasks],
+                        dtype=bool)
+        plotting.plot_tasks(ax, cost, importance, done, self.value_minmax)
+        plotting.plot_background(ax, self.value_minmax)
+        if legend:
+            shown = self.tasks[:plotting.legend_max]
+            handles, labels = plotting.legend_entries(
+                    [task.completed is not None for task in shown],
+                    [self._task_line(task, checkbox=False) for task in shown],
+                    len(self.tasks) - len(shown))
+            ax.legend(handles, labels,
+                      loc='upper left', bbox_to_anchor=(1.05,1))
+        fig.tight_layout()
+        if showplot:
+            plt.show()
@@ -0,0 +1,118 @@
+"""Headless plot export with a content-addressed render cache
+
+Rendered plots are cached in a directory next to the todo list, keyed on
+a hash of the stored task data (the snapshot plus any unsaved changes),
+`value_minmax` and the output format. Exporting an unchanged list copies
+the cached file without loading the list or importing matplotlib. The
+cache keeps the most recently used `max_entries` files.
+"""
+import os
+import shutil
+import hashlib
+
+from yatl import stats
+
+#: bump to invalidate cached plots when the plot style changes
+render_version = 1
+
+
+class RenderCache(object):
+    """Directory of rendered plots with least-recently-used eviction"""
+
+    def __init__(self, fpath, max_entries=16):
+        """Open the render cache belonging to the todo list at `fpath`"""
+        pathsplit = os.path.split(fpath)
+        self.fpath = fpath
+        self.dpath = os.path.join(pathsplit[0], '.'+pathsplit[1]+'.render')
+        self.max_entries = max_entries
+
+    def key(self, value_minmax, fmt, figsize):
+        """Hash of everything that the rendered plot depends on"""
+        pathsplit = os.path.split(self.fpath)
+        fpath_tmp = os.path.join(pathsplit[0], '.'+pathsplit[1])
+        h = hashlib.sha256()
+        h.update(repr((render_version, tuple(value_minmax), fmt,
+                       tuple(figsize))).encode('utf-8'))
+        for fpath in (self.fpath, fpath_tmp, fpath_tmp+'.journal.compacting',
+                      fpath_tmp+'.journal'):
+            h.update(b'\0' + fpath.encode('utf-8') + b'\0')
+            try:
+                with open(fpath, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        h.update(block)
+            except FileNotFoundError:
+                pass
+        return h.hexdigest()
+
+    def path(self, key, fmt):
+        return os.path.join(self.dpath, key+'.'+fmt)
+
+    def get(self, key, fmt):
+        """Path of the cached plot, or None on a cache miss"""
+        fpath = self.path(key, fmt)
+        if not os.path.isfile(fpath):
+            return None
+        # mark as recently used
+        os.utime(fpath)
+        return fpath
+
+    def put(self, key, fmt, render):
+        """Render a plot into the cache with `render(fpath)`, evicting
+        the least recently used plots, and return its path
+        """
+        os.makedirs(self.dpath, exist_ok=True)
+        fpath = self.path(key, fmt)
+        fpath_new = fpath + '.new.' + fmt
+        render(fpath_new)
+        os.replace(fpath_new, fpath)
+        self.evict()
+        return fpath
+
+    def evict(self):
+        entries = [os.path.join(self.dpath, fname)
+                   for fname in os.listdir(self.dpath)
+                   if '.new.' not in fname]
+        entries.sort(key=os.path.getmtime)
+        for fpath in entries[:max(0, len(entries) - self.max_entries)]:
+            os.remove(fpath)
+
+
+@stats.timed('export plot')
+def export_plot(fpath, outpath, value_minmax=(1,4), figsize=(10,4),
+                cache=True):
+    """Render the plot of a todo list to an image file without a display
+
+    Parameters
+    ----------
+    fpath : str
+        Path to todo list
+    outpath : str
+        Output image, in a format that matplotlib can write (e.g., .png
+        or .svg)
+    value_minmax : list or tuple, optional
+        Minimum/maximum values for importance and cost
+    figsize : tuple, optional
+        Figure size, in inches
+    cache : bool, optional
+        Reuse the plot rendered for the same task data, if available
+    """
+    fmt = os.path.splitext(outpath)[1].lstrip('.').lower() or 'png'
+    rendercache = RenderCache(fpath)
+    key = rendercache.key(value_minmax, fmt, figsize)
+    cached = rendercache.get(key, fmt) if cache else None
+    if cached is not None:
+        stats.count('render cache hits')
+    else:
+        def render(fpath_out):
+            from yatl.todo import Todo
+            from matplotlib.figure import Figure
+            todo = Todo(fpath, value_minmax=value_minmax, verbose=False)
+            fig = Figure(figsize=figsize)
+            ax = fig.add_subplot()
+            # jitter is seeded from the data, so that the plot for a given
+            # list is always the same
+            todo.plot(fig=fig, ax=ax, seed=int(key[:8], 16))
+            fig.savefig(fpath_out, format=fmt)
+        cached = rendercache.put(key, fmt, render)
+    shutil.copyfile(cached, outpath)
+    print('Wrote',outpath)
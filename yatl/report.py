@@ -0,0 +1,130 @@
+"""Productivity analytics for a todo list
+
+All metrics are computed with vectorized pandas operations over the
+creation and completion datetimes: throughput is a resampled count of
+completions, and the (priority-weighted) backlog over time is the
+cumulative sum of +1 at creation and -1 at completion for each task.
+"""
+import numpy as np
+import pandas as pd
+
+from yatl import stats
+
+
+def quadrants(df, value_minmax):
+    """Quadrant of each task on the time commitment vs importance plot,
+    numbered as in Todo.plot_background
+    """
+    value_split = np.mean(value_minmax)
+    important = df['importance'].values > value_split
+    costly = df['cost'].values > value_split
+    # 1 and 2 are the top row, 1 and 3 the left column
+    return pd.Series(1 + 2*(~important) + costly, index=df.index)
+
+
+def _open_over_time(created, completed, weights, freq):
+    """Sums of the columns of `weights` over the tasks that are open at
+    the end of each period
+    """
+    done = completed.notna().values
+    weights = weights.astype(float)
+    events = pd.concat([
+        weights.set_axis(created.values, axis=0),
+        -weights[done].set_axis(completed.values[done], axis=0),
+    ]).sort_index(kind='mergesort')
+    return events.cumsum().resample(freq).last().ffill()
+
+
+@stats.timed('report')
+def productivity_report(df, value_minmax=(1,4), freq='W'):
+    """Compute throughput and backlog metrics
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Tasks, with the columns of Todo.df
+    value_minmax : list or tuple, optional
+        Minimum/maximum values for importance and cost, which determine
+        the plot quadrants
+    freq : str, optional
+        Period for the metrics over time, e.g., 'W' for weekly
+
+    Returns
+    -------
+    Dict with a `summary` series and dataframes of metrics per period
+    """
+    created = pd.to_datetime(df['datetime'], format='%Y-%m-%d %H:%M:%S',
+                             errors='coerce')
+    completed = df['completed']
+    done = completed.notna()
+    quadrant = quadrants(df, value_minmax)
+    priority = df['priority'].values.astype(float)
+    time_to_complete = (completed - created)[done]
+
+    summary = pd.Series({
+        'tasks': len(df),
+        'completed': int(done.sum()),
+        'open': int((~done).sum()),
+        'median time to completion': time_to_complete.median(),
+        'priority-weighted backlog': priority[~done.values].sum(),
+    })
+    report = dict(summary=summary)
+    if len(df) == 0:
+        return report
+
+    # throughput
+    completions = pd.Series(1, index=completed[done].values).sort_index()
+    daily = completions.resample('D').sum()
+    report['completed per day'] = pd.DataFrame({
+        'completed': daily,
+        '7-day mean': daily.rolling(7, min_periods=1).mean(),
+    })
+
+    # backlog at the end of each period, overall and per quadrant, which
+    # spans all periods with any task created or completed
+    onehot = pd.get_dummies(quadrant).reindex(columns=[1,2,3,4],
+                                              fill_value=0)
+    weights = pd.concat([
+        pd.DataFrame({'open': np.ones(len(df)),
+                      'priority-weighted backlog': priority},
+                     index=df.index),
+        onehot,
+    ], axis=1)
+    backlog = _open_over_time(created, completed, weights, freq)
+    periods = backlog.index
+
+    per_period = pd.DataFrame({
+        'completed': completions.resample(freq).sum(),
+        'median time to completion': pd.Series(
+                time_to_complete.values,
+                index=completed[done].values).sort_index()
+                .resample(freq).median(),
+    }).reindex(periods)
+    per_period['completed'] = per_period['completed'].fillna(0).astype(int)
+    per_period['open'] = backlog['open'].round().astype(int)
+    per_period['priority-weighted backlog'] = \
+            backlog['priority-weighted backlog']
+    report['per period'] = per_period
+
+    # quadrant breakdown
+    report['completed per quadrant'] = (
+        onehot[done.values].set_axis(completed[done].values, axis=0)
+        .sort_index().resample(freq).sum()
+        .reindex(index=periods, fill_value=0).astype(int)
+    )
+    report['open per quadrant'] = backlog[[1,2,3,4]].round().astype(int)
+    return report
+
+
+def format_report(report, last=8):
+    """Format a report as text, showing the `last` periods of each
+    metric over time
+    """
+    sections = ['Summary', report['summary'].to_string()]
+    for name,table in report.items():
+        if name == 'summary':
+            continue
+        sections.append('')
+        sections.append('{:s} (last {:d})'.format(name.capitalize(), last))
+        sections.append(table.tail(last).to_string())
+    return '\n'.join(sections)
@@ -0,0 +1,104 @@
+import time
+import threading
+
+from yatl.formats import journal_is_large
+
+
+class SaveScheduler(object):
+    """Save a todo list from a worker thread after a short delay, so that
+    edits do not block the caller and bursts of edits are coalesced into
+    a single write
+    """
+
+    def __init__(self, todo, delay=1.0, max_delay=5.0, compact=False):
+        """Start saving edits to the todo list in the background
+
+        Parameters
+        ----------
+        todo : yatl.todo object
+        delay : float, optional
+            Seconds to wait after the last edit before saving
+        max_delay : float, optional
+            Maximum seconds that an edit may wait to be saved during a
+            continuous stream of edits
+        compact : bool, optional
+            Also compact the list once its change journal grows large,
+            e.g., in a long-running daemon. Interactive sessions leave this
+            off, so that their changes can still be discarded on exit.
+        """
+        self.todo = todo
+        self.delay = delay
+        self.max_delay = max_delay
+        self.compact = compact
+        self._cond = threading.Condition()
+        self._first_edit = None # time of the first unsaved edit
+        self._deadline = None # time at which to save
+        self._saving = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        todo.on_edit = self.schedule
+
+    def schedule(self):
+        """Mark the list as dirty and (re)start the debounce timer"""
+        with self._cond:
+            now = time.monotonic()
+            if self._first_edit is None:
+                self._first_edit = now
+            self._deadline = min(now + self.delay,
+                                 self._first_edit + self.max_delay)
+            self._cond.notify_all()
+
+    def _run(self):
+        with self._cond:
+            while True:
+                if self._deadline is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if (remaining > 0) and not self._closed:
+                    self._cond.wait(remaining)
+                    continue
+                self._save_unlocked()
+
+    def _save_unlocked(self):
+        """Save with the condition lock released, so that edits can be
+        scheduled in the meantime
+        """
+        self._first_edit = None
+        self._deadline = None
+        self._saving = True
+        self._cond.release()
+        try:
+            self.todo.save()
+            if self.compact and journal_is_large(self.todo.fpath,
+                                                 self.todo.fpath_journal):
+                # the compaction prints its own errors
+                self.todo.compact(background=True).join()
+        except Exception as e:
+            print('Background save failed:',e)
+        finally:
+            self._cond.acquire()
+            self._saving = False
+            self._cond.notify_all()
+
+    def flush(self):
+        """Save any pending edits now, waiting for an in-flight save to
+        finish first
+        """
+        with self._cond:
+            while self._saving:
+                self._cond.wait()
+            if self._deadline is not None:
+                self._save_unlocked()
+
+    def close(self):
+        """Flush pending edits and stop the worker thread"""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.todo.on_edit = None
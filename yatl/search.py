@@ -0,0 +1,171 @@
+"""Inverted index for full-text search over task descriptions
+
+The index maps each lowercase word to the labels of the tasks whose
+descriptions contain it, so a query only touches the postings of its own
+words instead of scanning the description column. Archived tasks are
+indexed per archive partition, by row within the partition.
+
+The index is saved next to the todo list after the list is compacted,
+together with the size and modification time of the snapshot it
+describes, so that it is only rebuilt when the snapshot has changed.
+"""
+import os
+import re
+import json
+
+token_pattern = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Set of lowercase words in a description"""
+    if not isinstance(text, str):
+        return set()
+    return set(token_pattern.findall(text.lower()))
+
+
+def file_signature(fpath):
+    """Size and modification time of a file, or None if it is missing"""
+    try:
+        st = os.stat(fpath)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _intersect(postings, tokens):
+    """Intersect the postings for all tokens, smallest first"""
+    sets = [postings.get(token) for token in tokens]
+    if (len(sets) == 0) or any(s is None for s in sets):
+        return set()
+    sets.sort(key=len)
+    matches = set(sets[0])
+    for s in sets[1:]:
+        matches.intersection_update(s)
+        if len(matches) == 0:
+            break
+    return matches
+
+
+class SearchIndex(object):
+    """Map from words to the tasks that contain them"""
+
+    def __init__(self):
+        # token : set of task labels (or a sorted list, for postings
+        # loaded from file that have not been modified yet)
+        self.postings = dict()
+        self.archived = dict() # partition : (size, {token : set of rows})
+
+    @classmethod
+    def build(cls, descriptions):
+        """Index a series of task descriptions, keyed by task label"""
+        index = cls()
+        for label,description in descriptions.items():
+            index.add(label, description)
+        return index
+
+    def _labels(self, token):
+        labels = self.postings.get(token)
+        if not isinstance(labels, set):
+            labels = set(labels or ())
+            self.postings[token] = labels
+        return labels
+
+    def add(self, label, description):
+        for token in tokenize(description):
+            self._labels(token).add(label)
+
+    def remove(self, label, description):
+        for token in tokenize(description):
+            if token in self.postings:
+                labels = self._labels(token)
+                labels.discard(label)
+                if len(labels) == 0:
+                    del self.postings[token]
+
+    def lookup(self, query):
+        """Labels of the tasks that contain every word in the query"""
+        return _intersect(self.postings, tokenize(query))
+
+    def lookup_archived(self, query):
+        """Rows of the archived tasks that contain every word in the
+        query, as a dict of partition : sorted rows
+        """
+        tokens = tokenize(query)
+        hits = dict()
+        for key,(size,postings) in sorted(self.archived.items()):
+            rows = _intersect(postings, tokens)
+            if len(rows) > 0:
+                hits[key] = sorted(rows)
+        return hits
+
+    def update_archive(self, archive):
+        """Index archive partitions that are new or have grown since they
+        were last indexed
+
+        Returns
+        -------
+        Whether the index changed
+        """
+        keys = archive.partitions()
+        updated = False
+        for key in list(self.archived):
+            if key not in keys:
+                del self.archived[key]
+                updated = True
+        for key in keys:
+            size = os.path.getsize(archive.partition_path(key))
+            if (key in self.archived) and (self.archived[key][0] == size):
+                continue
+            updated = True
+            df = archive.read_partition(key)
+            postings = dict()
+            for row,description in enumerate(df['description'].values):
+                for token in tokenize(description):
+                    postings.setdefault(token, set()).add(row)
+            self.archived[key] = (size, postings)
+        return updated
+
+    def copy(self):
+        """Copy that can be saved while this index is being modified"""
+        index = SearchIndex()
+        index.postings = {token: set(labels)
+                          for token,labels in self.postings.items()}
+        index.archived = dict(self.archived)
+        return index
+
+    def save(self, fpath, signature):
+        """Write the index for the snapshot with the given signature (see
+        `file_signature`)
+        """
+        data = {
+            'snapshot': signature,
+            'postings': {token: sorted(labels)
+                         for token,labels in self.postings.items()},
+            'archived': {key: [size, {token: sorted(rows)
+                                      for token,rows in postings.items()}]
+                         for key,(size,postings) in self.archived.items()},
+        }
+        fpath_new = fpath + '.new'
+        with open(fpath_new, 'w') as f:
+            json.dump(data, f, separators=(',',':'))
+        os.replace(fpath_new, fpath)
+
+    @classmethod
+    def load(cls, fpath, signature):
+        """Read a saved index, or return None if it is missing or out of
+        date
+        """
+        try:
+            with open(fpath) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if data.get('snapshot') != signature:
+            return None
+        index = cls()
+        # postings are converted to sets when they are first modified
+        index.postings = data['postings']
+        index.archived = {key: (size, {token: set(rows)
+                                       for token,rows in postings.items()})
+                          for key,(size,postings) in data['archived'].items()}
+        return index
@@ -0,0 +1,132 @@
+"""Resident daemon that keeps a todo list loaded in memory and answers
+requests over a Unix socket (see yatl.client)
+
+Edits are saved to the change journal in the background, and the list is
+compacted into a new snapshot once the journal grows large and when the
+daemon shuts down. Other commands
+must not load and save the list while it is being served, since their
+changes would be overwritten then, so yatla.py refuses to run them.
+"""
+import io
+import os
+import sys
+import json
+import signal
+import threading
+import contextlib
+import socketserver
+
+from yatl import client
+from yatl.scheduler import SaveScheduler
+
+#: requests that modify the list
+edit_ops = ('add', 'complete', 'delete')
+
+
+def run_request(todo, req):
+    """Carry out a request on a todo list and return its text output
+
+    Parameters
+    ----------
+    todo : yatl.todo object
+    req : dict
+        Request with an `op` item, which is one of review, top, search,
+        add, complete, delete or ping, plus any arguments for the operation
+    """
+    op = req['op']
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        if op == 'review':
+            lines = todo.review_lines()
+            if len(lines) > 0:
+                print('\n'.join(lines))
+        elif op == 'top':
+            lines = todo.review_lines(todo.top(int(req['n'])))
+            if len(lines) > 0:
+                print('\n'.join(lines))
+        elif op == 'search':
+            lines = todo.review_lines(todo.search(req['query']))
+            archived = todo.search_archived(req['query'])
+            if len(archived) > 0:
+                lines.append('Archived:')
+                lines += todo.review_lines(archived)
+            if len(lines) > 0:
+                print('\n'.join(lines))
+        elif op == 'add':
+            importance = req.get('importance')
+            cost = req.get('cost')
+            if importance is None:
+                importance = todo.value_minmax[1]
+            if cost is None:
+                cost = todo.value_minmax[0]
+            task_id = todo.add_task(req['description'], float(importance),
+                                    float(cost))
+            print('Added task',task_id)
+        elif op == 'complete':
+            todo.mark_complete(int(req['label']))
+        elif op == 'delete':
+            todo.delete_task(int(req['label']))
+        elif op != 'ping':
+            raise ValueError('Unknown request: '+str(op))
+    return output.getvalue()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # connection closed without a request, see client.is_running
+            return
+        try:
+            req = json.loads(line.decode('utf-8'))
+            if req['op'] == 'shutdown':
+                # shutdown() blocks until serve_forever() returns
+                threading.Thread(target=self.server.shutdown).start()
+                response = dict(ok=True, output='Shutting down\n')
+            else:
+                output = run_request(self.server.todo, req)
+                response = dict(ok=True, output=output)
+        except Exception as e:
+            response = dict(ok=False, error='{:s}: {:s}'.format(
+                    type(e).__name__, str(e)))
+        self.wfile.write((json.dumps(response)+'\n').encode('utf-8'))
+
+
+class TodoServer(socketserver.UnixStreamServer):
+    """Serve a todo list over a Unix socket (see client.socket_path),
+    handling one request at a time
+    """
+
+    def __init__(self, todo, sockpath=None):
+        if sockpath is None:
+            sockpath = client.socket_path(todo.fpath)
+        if os.path.exists(sockpath):
+            if client.is_running(todo.fpath):
+                raise RuntimeError('A daemon is already serving '+todo.fpath)
+            os.remove(sockpath)
+        self.todo = todo
+        self.sockpath = sockpath
+        self.saver = SaveScheduler(todo, compact=True)
+        socketserver.UnixStreamServer.__init__(self, sockpath, RequestHandler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.sockpath):
+            os.remove(self.sockpath)
+        self.saver.close()
+        if self.todo.changed:
+            self.todo.save(overwrite=True)
+
+
+def serve(todo):
+    """Serve a todo list until interrupted or asked to shut down"""
+    server = TodoServer(todo)
+    # exit cleanly (saving the list) on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print('Serving',todo.fpath,'on',server.sockpath)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,122 @@
+"""Lightweight timing instrumentation for YATL sessions
+
+Timers and counters are no-ops until `enable` is called, so instrumented
+code pays only for a global flag check. Stats can also be enabled from
+the environment (see `configure_from_env`), which is how they are turned
+on for the GUI.
+"""
+import os
+import sys
+import time
+import atexit
+import functools
+
+enabled = False
+timings = dict() # name : [number of calls, total seconds]
+counters = dict() # name : total
+
+
+class _Timer(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _add_time(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_null_timer = _NullTimer()
+
+
+def _add_time(name, seconds):
+    entry = timings.setdefault(name, [0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+
+
+def timer(name):
+    """Context manager that times a block of code"""
+    if not enabled:
+        return _null_timer
+    return _Timer(name)
+
+
+def timed(name):
+    """Decorator that times every call of a function"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _add_time(name, time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """Add to a counter, e.g., the number of bytes written"""
+    if enabled:
+        counters[name] = counters.get(name, 0) + n
+
+
+def enable(report_at_exit=True):
+    """Start collecting stats, optionally printing them on exit"""
+    global enabled
+    if report_at_exit and not enabled:
+        atexit.register(report)
+    enabled = True
+
+
+def report(file=None):
+    """Print a per-phase breakdown of the collected stats"""
+    if file is None:
+        file = sys.stderr
+    print('{:24s} {:>8s} {:>12s} {:>12s}'.format(
+            'phase','calls','total [ms]','mean [ms]'), file=file)
+    for name,(ncalls,total) in sorted(timings.items(),
+                                      key=lambda item: -item[1][1]):
+        print('{:24s} {:8d} {:12.3f} {:12.3f}'.format(
+                name, ncalls, 1e3*total, 1e3*total/ncalls), file=file)
+    for name,total in sorted(counters.items()):
+        print('{:24s} {:>8s} {:>12d}'.format(name, '', total), file=file)
+
+
+def start_profile(fpath):
+    """Profile the rest of the session with cProfile, writing the stats
+    to `fpath` on exit (view with `python -m pstats fpath`)
+    """
+    import cProfile
+    profiler = cProfile.Profile()
+    def dump():
+        profiler.disable()
+        profiler.dump_stats(fpath)
+        print('Wrote profile to',fpath, file=sys.stderr)
+    atexit.register(dump)
+    profiler.enable()
+    return profiler
+
+
+def configure_from_env():
+    """Enable stats if YATL_STATS is set to a non-empty value other than
+    0, and profile the session to the file given by YATL_PROFILE
+    """
+    if os.environ.get('YATL_STATS', '') not in ('', '0'):
+        enable()
+    fpath = os.environ.get('YATL_PROFILE', '')
+    if fpath:
+        start_profile(fpath)
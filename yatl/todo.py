@@ -1,30 +1,195 @@
 import os
+import json
+import bisect
+import threading
+import contextlib
 import numpy as np
 import pandas as pd
 
-# to avoid NSException when initializing Tkinter gui
-# (see https://github.com/MTG/sms-tools/issues/29)
-# - matplotlib.use() should come before the matplotlib.pyplot import
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
+from yatl import stats, formats, plotting
+from yatl.search import SearchIndex, file_signature
+from yatl.priority import PriorityEngine, day
+
+
+class CSVStorage(object):
+    """Store the todo list as CSV text, which is also the format used
+    for exporting lists
+
+    Task ids are stored in the first column; lists written before tasks
+    had ids are given ids in file order.
+    """
+    datetime_format = '%Y-%m-%d %H:%M:%S'
+
+    @stats.timed('parse')
+    def read(self, fpath):
+        return self._set_ids(pd.read_csv(fpath))
+
+    def read_chunks(self, fpath, chunksize=10000):
+        """Read the list as a sequence of dataframes"""
+        with pd.read_csv(fpath, chunksize=chunksize) as reader:
+            for chunk in reader:
+                yield self._set_ids(chunk)
+
+    def _set_ids(self, df):
+        if 'id' in df.columns:
+            df = df.set_index('id')
+            df.index.name = None
+        return df
+
+    def write(self, df, fpath, append=False):
+        """Write the dataframe, or append it to an existing file"""
+        df = df.copy()
+        # incomplete tasks are stored as False
+        df['completed'] = df['completed'].dt.strftime(self.datetime_format)
+        df['completed'] = df['completed'].fillna(False)
+        if append and os.path.isfile(fpath):
+            df.to_csv(fpath, index_label='id', mode='a', header=False)
+        else:
+            df.to_csv(fpath, index_label='id')
+
+
+class BinaryStorage(object):
+    """Store the todo list in a compact, typed binary format that is
+    loaded by memory-mapping the file
+
+    The file starts with a magic string and a JSON header describing
+    each column, with offsets relative to the (aligned) end of the
+    header. Numeric and datetime columns are stored as raw arrays;
+    text columns are stored as a heap of NUL-separated UTF-8 strings that
+    is decoded with a single split. All arrays are 8-byte aligned. Task
+    ids are stored as an integer `id` column.
+    """
+    magic = formats.binary_magic
+    align = 8
+
+    @stats.timed('parse')
+    def read(self, fpath):
+        with open(fpath, 'rb') as f:
+            if f.read(len(self.magic)) != self.magic:
+                raise IOError(fpath+' is not a binary todo list')
+            headerlen = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(headerlen).decode('utf-8'))
+        datastart = self._data_offset(headerlen)
+        nrows = header['nrows']
+        data = {}
+        for name,col in header['columns'].items():
+            if col['count'] == 0:
+                arr = np.empty(0, dtype=col['dtype'])
+            else:
+                # copy-on-write mapping, so that the dataframe can be edited
+                arr = np.memmap(fpath, dtype=col['dtype'], mode='c',
+                                offset=datastart+col['offset'],
+                                shape=(col['count'],))
+            if col['kind'] == 'text':
+                values = arr.tobytes().decode('utf-8').split('\0')
+                if nrows == 0:
+                    values = []
+                arr = np.array(values, dtype=object)
+            data[name] = arr
+        columns = [name for name in header['columns'] if name != 'id']
+        index = data.pop('id', None)
+        return pd.DataFrame(data, columns=columns, index=index)
+
+    def write(self, df, fpath):
+        columns = {}
+        arrays = []
+        offset = 0
+        for name in ['id'] + list(df.columns):
+            if name == 'id':
+                values = df.index.values.astype(np.int64)
+            else:
+                values = df[name].values
+            if (name != 'id') and pd.api.types.infer_dtype(values) in (
+                    'integer', 'floating', 'mixed-integer-float'):
+                values = values.astype(float)
+            if values.dtype.kind in 'biufM':
+                kind = 'raw'
+                arr = np.ascontiguousarray(values)
+            else:
+                kind = 'text'
+                heap = '\0'.join(map(str, values)).encode('utf-8')
+                arr = np.frombuffer(heap, dtype=np.uint8)
+            columns[name] = dict(kind=kind, dtype=arr.dtype.str,
+                                 offset=offset, count=len(arr))
+            arrays.append(arr)
+            offset += -(-arr.nbytes // self.align) * self.align
+        header = json.dumps(dict(nrows=len(df), columns=columns))
+        header = header.encode('utf-8')
+        with open(fpath, 'wb') as f:
+            f.write(self.magic)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for arr in arrays:
+                f.write(b'\0' * (-f.tell() % self.align))
+                f.write(arr.tobytes())
+
+    def _data_offset(self, headerlen):
+        size = len(self.magic) + 8 + headerlen
+        return -(-size // self.align) * self.align
+
+
+def _json_default(obj):
+    # numpy scalars from dataframe columns
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('Cannot serialize '+type(obj).__name__)
+
+
+def read_task_file(fpath, chunksize=10000):
+    """Stream tasks from a CSV or JSON-lines (.jsonl) file
+
+    Each chunk is a dataframe with at least `description`, `importance`
+    and `cost` columns; see `Todo.add_tasks`.
+    """
+    if os.path.splitext(fpath)[1].lower() in ('.jsonl', '.ndjson'):
+        reader = pd.read_json(fpath, lines=True, chunksize=chunksize,
+                              dtype=False)
+    else:
+        reader = pd.read_csv(fpath, chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            yield chunk
+
+
+storage_backends = {
+    '.csv': CSVStorage,
+    '.yatl': BinaryStorage,
+}
+
+
+def get_storage(fpath):
+    """Select a storage backend based on the file extension, defaulting
+    to CSV
+    """
+    ext = os.path.splitext(fpath)[1].lower()
+    return storage_backends.get(ext, CSVStorage)()
 
 
 class Todo(object):
     """Object to contain a dataframe with tasks as rows"""
 
-    todo_columns = [
-        'datetime',
-        'description',
-        'importance',
-        'cost',
-        'priority',
-        'completed',
-    ]
-    complete_mark='✔'
-    incomplete_mark='✘'
-
-    def __init__(self, fpath, value_minmax=(1,4)):
+    todo_columns = {
+        'datetime': object,
+        'description': object,
+        'importance': float,
+        'cost': float,
+        'priority': float,
+        'completed': 'datetime64[ns]',
+    }
+    complete_mark = formats.complete_mark
+    incomplete_mark = formats.incomplete_mark
+    datetime_format = formats.datetime_format
+    # (marker, color) for incomplete and completed tasks
+    plot_styles = plotting.plot_styles
+    plot_density_threshold = plotting.plot_density_threshold
+    legend_max = plotting.legend_max
+    # number of highest-priority tasks kept while loading progressively,
+    # i.e., the first screen of the review or GUI task list
+    preview_size = formats.first_screen
+    load_chunksize = 10000
+
+    def __init__(self, fpath, value_minmax=(1,4), journal=True, storage=None,
+                 verbose=True, progressive=False, priority_engine=None):
         """Create a new todo list from the specified file
 
         Parameters
@@ -33,49 +198,603 @@ class Todo(object):
             Path to todo list, stored as a dataframe
         value_minmax : list or tuple, optional
             Minimum/maximum values for importance and cost
+        journal : bool, optional
+            If True, edits are appended to a change journal next to
+            `fpath` instead of rewriting the entire list to the
+            temporary file after every edit
+        storage : CSVStorage or BinaryStorage, optional
+            Storage backend for the list, selected based on the file
+            extension by default (see `storage_backends`)
+        verbose : bool, optional
+            Print the path of the todo list when loading it
+        progressive : bool, optional
+            Load a saved CSV list in chunks from a background thread,
+            keeping the `preview_size` highest-priority tasks loaded so
+            far in `preview`; methods that need the whole list wait for
+            the `loaded` event
+        priority_engine : yatl.priority.PriorityEngine, optional
+            Scores that tasks are ranked by, which may change over time;
+            the ratio of importance to cost by default
         """
         self.fpath = fpath
         self.value_minmax = value_minmax
+        self.journal = journal
+        if storage is None:
+            storage = get_storage(fpath)
+        self.storage = storage
+        self.verbose = verbose
+        self.progressive = progressive
+        if priority_engine is None:
+            priority_engine = PriorityEngine()
+        self.priority_engine = priority_engine
         self.changed = False
+        self._pending = [] # journal records not yet written
+        self._edits = 0 # number of edits, to tell if any raced a compaction
+        # called instead of save() after each edit, e.g., to schedule a
+        # background save (see yatl.scheduler)
+        self.on_edit = None
+        # protects the dataframe and pending records from concurrent saves
+        self.lock = threading.RLock()
         self._read_list()
 
+    @stats.timed('load')
     def _read_list(self):
-        # make sure temp file doesn't exist
-        print('Todo list:',self.fpath)
+        if self.verbose:
+            print('Todo list:',self.fpath)
         pathsplit = os.path.split(self.fpath)
         self.fpath_tmp = os.path.join(pathsplit[0], '.'+pathsplit[1])
-        assert (not os.path.isfile(self.fpath_tmp)), \
-                self.fpath_tmp+' exists, todo list was not properly saved'
-        # load todo list
+        self.fpath_journal = self.fpath_tmp + '.journal'
+        self.fpath_index = self.fpath_tmp + '.index'
+        self.fpath_meta = self.fpath_tmp + '.meta'
+        # whether rows are sorted, and the ordering index of sort keys,
+        # which is built lazily for the first incremental update
+        self._ordered = False
+        self._keys = None
+        self._incomplete = None # cached mask of incomplete tasks
+        # cached score coefficients of a dynamic priority engine, and the
+        # time (in days) until which the current ranking is valid
+        self._coef = None
+        self._ranked_until = -np.inf
+        # full-text search index, which is loaded or built on first use;
+        # a saved index can only be used while the tasks still match the
+        # snapshot
+        self._search = None
+        self._unchanged = True
+        # (inode, offset) up to which the journal has been read or written
+        self._journal_pos = None
+        meta = self._read_meta()
+        # next task id, which is never reused, even after the task with
+        # the highest id is deleted
+        self.next_id = meta.get('next_id', 0)
+        # set once the whole list is loaded
+        self.loaded = threading.Event()
+        self._load_error = None
+        # highest-priority tasks read so far by a progressive load, which
+        # are the first screen of the sorted list if the snapshot was
+        # written in order
+        self.preview = None
+        self.preview_exact = meta.get('ordered', False) \
+                and not self.priority_engine.dynamic
+        self.preview_ready = threading.Event()
+        if self.progressive and self._can_stream():
+            self.df = self._empty_frame()
+            self.preview = self.df
+            thread = threading.Thread(target=self._stream_list, daemon=True)
+            thread.start()
+            return
+        # load last snapshot
         try:
-            self.df = pd.read_csv(self.fpath)
+            self.df = self.storage.read(self.fpath)
         except FileNotFoundError: 
-            self.df = pd.DataFrame(columns=self.todo_columns)
+            self.df = self._empty_frame()
+        # recover changes from a session that was not properly saved
+        self._recover()
+        self._loaded()
+
+    def _empty_frame(self):
+        return pd.DataFrame({
+            col: pd.Series(dtype=dtype)
+            for col,dtype in self.todo_columns.items()
+        })
+
+    def _loaded(self):
+        self.df['completed'] = self._parse_completed(self.df['completed'])
+        if len(self.df) > 0:
+            self.next_id = max(self.next_id, int(self.df.index.max()) + 1)
+        # note: sorting is deferred until the order is needed, since
+        # queries like top() do not need a full sort
+        self.loaded.set()
+        self.preview_ready.set()
+
+    def _can_stream(self):
+        """Whether the list is a saved CSV snapshot without unsaved
+        changes, which can be read in chunks
+        """
+        if not isinstance(self.storage, CSVStorage):
+            return False
+        for fpath in (self.fpath_tmp, self.fpath_journal,
+                      self.fpath_journal+'.compacting'):
+            if os.path.isfile(fpath):
+                return False
+        return os.path.isfile(self.fpath)
+
+    def _stream_list(self):
+        """Read the list in chunks, updating the running top-k preview
+        after each chunk
+        """
+        chunks = []
+        try:
+            with stats.timer('progressive load'):
+                for chunk in self.storage.read_chunks(self.fpath,
+                                                      self.load_chunksize):
+                    chunk['completed'] = \
+                            self._parse_completed(chunk['completed'])
+                    chunks.append(chunk)
+                    candidates = pd.concat([self.preview, chunk])
+                    self.preview = self._select_top(candidates,
+                                                    self.preview_size)
+                    self.preview_ready.set()
+                if len(chunks) > 0:
+                    # note: not under the lock, since edits made while
+                    # holding it wait for the load to finish
+                    self.df = pd.concat(chunks)
+        except Exception as e:
+            self._load_error = e
+        finally:
+            self._loaded()
+
+    def wait_loaded(self):
+        """Wait for a progressive load to finish"""
+        if not self.loaded.is_set():
+            with stats.timer('wait for load'):
+                self.loaded.wait()
+        if self._load_error is not None:
+            raise self._load_error
+
+    def _read_meta(self):
+        """Read the list metadata saved next to the snapshot"""
+        try:
+            with open(self.fpath_meta) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return dict()
+
+    @staticmethod
+    def _parse_completed(completed):
+        """Convert the completed column to datetimes, with NaT for
+        incomplete tasks (stored as `False`)
+        """
+        if completed.dtype.kind == 'M':
+            return completed
+        completed = completed.astype(object)
+        incomplete = completed.isna() | completed.isin([False,'False'])
+        return pd.to_datetime(completed.mask(incomplete), errors='coerce')
+
+    @stats.timed('replay journal')
+    def _recover(self):
+        """Restore unsaved edits, either from the full copy of the list
+        in the temporary file or by replaying the change journal(s) over
+        the last snapshot
+        """
+        if os.path.isfile(self.fpath_tmp):
+            print('Recovering unsaved changes from',self.fpath_tmp)
+            self.df = CSVStorage().read(self.fpath_tmp)
+            self.changed = True
+            self._unchanged = False
+            self.df['completed'] = self._parse_completed(self.df['completed'])
+        # a rotated journal is left behind if compaction was interrupted;
+        # replay is idempotent, so it is safe to apply it again
+        for fpath in (self.fpath_journal+'.compacting', self.fpath_journal):
+            if os.path.isfile(fpath):
+                print('Replaying unsaved changes from',fpath)
+                if fpath == self.fpath_journal:
+                    # records appended after this are read again later,
+                    # which is safe since replay is idempotent
+                    st = os.stat(fpath)
+                    self._journal_pos = (st.st_ino, st.st_size)
+                for rec in formats.read_journal(fpath):
+                    self._apply(rec)
+                self.changed = True
+
+    def _apply(self, rec):
+        """Apply a single journal record to the dataframe
+
+        Every operation sets or removes the row with the given task id
+        (label), so replaying a sequence of records is idempotent.
+        """
+        op = rec['op']
+        i = rec.get('label')
+        self._incomplete = None
+        self._coef = None
+        self._unchanged = False
+        if op == 'add':
+            self.next_id = max(self.next_id, i+1)
+            task = dict(rec['task'])
+            task['completed'] = pd.NaT
+            self._unindex([i])
+            if self._search is not None:
+                self._search.add(i, task['description'])
+            if not self._ordered:
+                self._append_row(i, task)
+            elif self.priority_engine.dynamic:
+                # scores of existing tasks may have changed since they
+                # were ranked, so the list is ranked again when needed
+                self._append_row(i, task)
+                self._ordered = False
+            else:
+                self._insert_sorted(i, task)
+        elif op == 'delete':
+            self._unindex([i])
+            if (self._keys is not None) and (i in self.df.index):
+                del self._keys[self.df.index.get_loc(i)]
+            self.df.drop(labels=i, axis=0, inplace=True, errors='ignore')
+        elif op == 'extend':
+            newtasks = pd.DataFrame(rec['tasks'], columns=list(self.todo_columns))
+            newtasks.index = pd.RangeIndex(i, i+len(newtasks))
+            self.next_id = max(self.next_id, i+len(newtasks))
+            newtasks['completed'] = self._parse_completed(newtasks['completed'])
+            self._unindex(newtasks.index)
+            if self._search is not None:
+                for label,description in newtasks['description'].items():
+                    self._search.add(label, description)
+            self.df.drop(labels=newtasks.index, axis=0, inplace=True,
+                         errors='ignore')
+            self.df = pd.concat([self.df, newtasks])
+            self._ordered = False
+            self._keys = None
+        elif op == 'archive':
+            # rows stay in order, but the ordering index is rebuilt
+            self._unindex(rec['labels'])
+            self.df.drop(labels=rec['labels'], axis=0, inplace=True,
+                         errors='ignore')
+            self._keys = None
+        elif op == 'complete':
+            self.df.at[i,'completed'] = pd.Timestamp(rec['completed'])
+        elif op == 'incomplete':
+            self.df.at[i,'completed'] = pd.NaT
         else:
-            self.sort_list()
+            raise ValueError('Unknown journal operation: '+str(op))
+        if (op in ('complete','incomplete')) and self.priority_engine.dynamic:
+            # time-dependent terms only apply to open tasks
+            self._ordered = False
+
+    def _unindex(self, labels):
+        """Remove existing tasks from the search index"""
+        if self._search is None:
+            return
+        descriptions = self.df['description']
+        for label in labels:
+            if label in descriptions.index:
+                self._search.remove(label, descriptions[label])
+
+    def _record(self, op, label=None, **kwargs):
+        """Apply an edit and queue it for the change journal"""
+        self.wait_loaded()
+        stats.count('edits')
+        rec = dict(op=op, **kwargs)
+        if label is not None:
+            rec['label'] = int(label)
+        with self.lock:
+            self._apply(rec)
+            self._pending.append(rec)
+            self._edits += 1
+            self.changed = True
 
+    def _edited(self):
+        """Save after an edit, unless saving is handled elsewhere"""
+        if self.on_edit is None:
+            self.save()
+        else:
+            self.on_edit()
+
+    @staticmethod
+    def _sort_key(priority, importance, datetime):
+        return (-priority, -importance, datetime)
+
+    @stats.timed('sort')
     def sort_list(self):
-        self.df.sort_values(by=['priority','importance','datetime'],
-                            ascending=[False,False,True],
-                            inplace=True)
+        """Sort tasks by descending priority and importance, then by
+        creation time
+
+        After the first full sort, the ordering is maintained
+        incrementally by adding and deleting tasks, so this only sorts
+        rows that were loaded out of order. With a dynamic priority
+        engine, tasks are ranked again only once the order could have
+        changed (see yatl.priority).
+        """
+        self.wait_loaded()
+        if self.priority_engine.dynamic:
+            self._rank()
+            return
+        if self._ordered:
+            return
+        if not self._is_sorted():
+            self.df.sort_values(by=['priority','importance','datetime'],
+                                ascending=[False,False,True],
+                                kind='mergesort',
+                                inplace=True)
+            self._incomplete = None
+        self._ordered = True
+        self._keys = None
+
+    def scores(self, now=None):
+        """Current priority scores of all tasks, in dataframe order
+
+        Scores are evaluated from cached coefficients that are linear in
+        time, which are only recomputed after an edit or once they
+        expire.
+        """
+        engine = self.priority_engine
+        if now is None:
+            now = engine.now()
+        if (self._coef is None) or (len(self._coef) > 0
+                                    and now >= self._coef['until'].min()):
+            with stats.timer('score'):
+                self._coef = engine.coefficients(self.df, now)
+        return (self._coef['intercept'].values
+                + self._coef['slope'].values*now)
+
+    def _rank(self):
+        """Rank tasks by the scores of a dynamic priority engine, if the
+        ranking may have changed
+        """
+        engine = self.priority_engine
+        now = engine.now()
+        if self._ordered and (now < self._ranked_until):
+            return
+        with stats.timer('rank'):
+            score = self.scores(now)
+            order = self._rank_order(self.df, score)
+            if np.any(order != np.arange(len(order))):
+                self.df = self.df.iloc[order]
+                self._coef = self._coef.iloc[order]
+                self._incomplete = None
+            self._ranked_until = engine.next_change(self._coef, now)
+        self._ordered = True
+        self._keys = None
+
+    @staticmethod
+    def _rank_order(df, score):
+        """Positions of the tasks sorted by descending score and
+        importance, then by creation time
+        """
+        keys = pd.DataFrame({'score': score,
+                             'importance': df['importance'].values,
+                             'datetime': df['datetime'].values})
+        return keys.sort_values(by=['score','importance','datetime'],
+                                ascending=[False,False,True],
+                                kind='mergesort').index.values
+
+    def ranking_expires_in(self):
+        """Seconds until the order of the tasks could change, which is
+        infinite unless the priority engine is dynamic
+        """
+        if not self.priority_engine.dynamic:
+            return np.inf
+        return max(0.0, (self._ranked_until - self.priority_engine.now())
+                        * day)
+
+    def _ordering_index(self):
+        if self._keys is None:
+            self._keys = list(zip((-self.df['priority']).tolist(),
+                                  (-self.df['importance']).tolist(),
+                                  self.df['datetime'].tolist()))
+        return self._keys
+
+    def _is_sorted(self):
+        """Check whether the rows are already in order, which is the case
+        for saved snapshots
+        """
+        priority = self.df['priority'].values
+        importance = self.df['importance'].values
+        datetime = self.df['datetime'].values
+        if len(priority) < 2:
+            return True
+        p0, p1 = priority[:-1], priority[1:]
+        i0, i1 = importance[:-1], importance[1:]
+        ordered = (p0 > p1) | ((p0 == p1) & ((i0 > i1) | (
+                (i0 == i1) & (datetime[:-1] <= datetime[1:]))))
+        return bool(np.all(ordered))
+
+    def _insert_sorted(self, i, task):
+        """Insert a new row at its sorted position, found by bisecting
+        the ordering index
+        """
+        keys = self._ordering_index()
+        if i in self.df.index:
+            # replace existing row
+            del keys[self.df.index.get_loc(i)]
+            self.df.drop(labels=i, axis=0, inplace=True)
+        key = self._sort_key(task['priority'], task['importance'],
+                             task['datetime'])
+        pos = bisect.bisect_right(keys, key)
+        keys.insert(pos, key)
+        self.df = pd.concat([self.df.iloc[:pos], self._new_row(i, task),
+                             self.df.iloc[pos:]])
 
+    def _append_row(self, i, task):
+        """Add a new row at the end, or replace the row with the same id"""
+        if len(self.df) == 0:
+            # an empty dataframe would take the types of the values
+            self.df = self._new_row(i, task)
+        else:
+            # unlike a Series of mixed values, a list keeps the column types
+            self.df.loc[i] = [task[col] for col in self.df.columns]
+
+    def _new_row(self, i, task):
+        """Single-row dataframe with the column types of `todo_columns`"""
+        return pd.DataFrame([task], index=[i],
+                            columns=list(self.todo_columns)) \
+                .astype(self.todo_columns)
+
+    @stats.timed('save')
     def save(self,overwrite=False):
-        """Save the todo list (to the temporary file, by default)"""
+        """Save the todo list
+
+        By default, pending edits are appended to the change journal (or,
+        if journaling is disabled, the whole list is written to the
+        temporary file). With `overwrite`, all changes are compacted into
+        a new snapshot at `fpath`.
+        """
         if overwrite:
-            self.df.to_csv(self.fpath, index=False)
+            self.compact()
             print('Saved',self.fpath)
-            self.remove_temp()
+        elif self.journal:
+            # edits were marked as changes when they were made
+            self._write_journal()
         else:
             self.changed = True
-            self.df.to_csv(self.fpath_tmp, index=False)
+            with self.lock:
+                df = self.df.copy()
+            CSVStorage().write(df, self.fpath_tmp)
+            stats.count('bytes written', os.path.getsize(self.fpath_tmp))
 
-    def remove_temp(self):
-        try:
-            os.remove(self.fpath_tmp)
-        except IOError:
-            print('No changes')
+    def _write_journal(self):
+        if len(self._pending) > 0:
+            with self._journal_session():
+                pass
+
+    @contextlib.contextmanager
+    def _journal_session(self):
+        """Hold the lock on the change journal, then append the pending
+        edits to it
+
+        Edits that other processes appended to the journal since it was
+        last read are applied first, so that ids allocated while holding
+        the lock are not used by another process. Acquire this before
+        `self.lock`.
+        """
+        if not self.journal:
+            yield
+            return
+        with formats.locked_journal(self.fpath_journal) as f:
+            self._sync_journal(f)
+            yield
+            with self.lock:
+                pending, self._pending = self._pending, []
+            if len(pending) > 0:
+                lines = ''.join(json.dumps(rec, default=_json_default)+'\n'
+                                for rec in pending)
+                nbytes, self._journal_pos = formats.append_journal(f, lines)
+                stats.count('bytes written', nbytes)
+
+    def _sync_journal(self, f):
+        """Apply the edits in the locked journal `f` that were written by
+        other processes, and the ids that they used in a snapshot
+        """
+        records, self._journal_pos = formats.read_since(f, self._journal_pos)
+        with self.lock:
+            if len(records) > 0:
+                # pending edits are newer, so they are applied again
+                for rec in records + self._pending:
+                    self._apply(rec)
+                self._edits += len(records)
+                self.changed = True
+            self.next_id = max(self.next_id,
+                               formats.read_next_id(self.fpath_meta))
+
+    def compact(self, background=False):
+        """Roll the change journal into a new snapshot at `fpath`
+
+        The current journal is rotated out of the way first so that edits
+        made while the snapshot is being written go to a fresh journal.
+
+        Parameters
+        ----------
+        background : bool, optional
+            Write the snapshot from a separate thread, which is returned.
+            An error in the write is printed and kept as the `error`
+            attribute of the thread.
+        """
+        rotated = self.fpath_journal + '.compacting'
+        self.wait_loaded()
+        with contextlib.ExitStack() as stack:
+            if self.journal:
+                # other writers must not append to the journal while it
+                # is rotated, and their edits must be in the snapshot
+                self._sync_journal(stack.enter_context(
+                        formats.locked_journal(self.fpath_journal)))
+            stack.enter_context(self.lock)
+            # snapshots are written in order, so they load without sorting
+            self.sort_list()
+            self._pending = []
+            if os.path.isfile(self.fpath_journal):
+                if os.path.isfile(rotated):
+                    # previous compaction was interrupted, keep its records
+                    with open(rotated, 'a') as fout, \
+                            open(self.fpath_journal) as fin:
+                        fout.write(fin.read())
+                    os.remove(self.fpath_journal)
+                else:
+                    os.replace(self.fpath_journal, rotated)
+            df = self.df.copy()
+            # sorted above, so that a progressive load can show the
+            # first rows right away
+            meta = dict(next_id=self.next_id,
+                        ordered=not self.priority_engine.dynamic)
+            # written before other writers can allocate ids again, which is
+            # safe since the metadata is not trusted while the rotated
+            # journal exists
+            with open(self.fpath_meta, 'w') as f:
+                json.dump(meta, f)
+            edits = self._edits
+            search = None
+            if self._search is not None:
+                # the saved index refers to tasks by snapshot row
+                search = self._search.copy()
+        def write_snapshot():
+            fpath_new = self.fpath_tmp + '.snapshot'
+            with stats.timer('write snapshot'):
+                self.storage.write(df, fpath_new)
+            stats.count('bytes written', os.path.getsize(fpath_new))
+            os.replace(fpath_new, self.fpath)
+            if search is not None:
+                with stats.timer('write search index'):
+                    search.save(self.fpath_index, file_signature(self.fpath))
+            for fpath in (rotated, self.fpath_tmp):
+                if os.path.isfile(fpath):
+                    os.remove(fpath)
+            with self.lock:
+                # edits made during the write are only in the new journal
+                if self._edits == edits:
+                    self.changed = False
+        if background:
+            def run():
+                try:
+                    write_snapshot()
+                except Exception as e:
+                    # the rotated journal is kept, so nothing is lost
+                    print('Background compaction failed:',e)
+                    thread.error = e
+            thread = threading.Thread(target=run)
+            thread.error = None
+            thread.start()
+            return thread
         else:
-            print('Cleaned up',self.fpath_tmp)
+            write_snapshot()
+
+    def export(self, fpath, storage=None):
+        """Write the todo list to another file, e.g., to convert between
+        storage formats
+
+        Parameters
+        ----------
+        fpath : str
+            Output path
+        storage : CSVStorage or BinaryStorage, optional
+            Storage backend, selected based on the file extension by
+            default
+        """
+        if storage is None:
+            storage = get_storage(fpath)
+        self.wait_loaded()
+        storage.write(self.df, fpath)
+        print('Exported',fpath)
+
+    def remove_temp(self):
+        """Discard unsaved changes"""
+        self._pending = []
+        formats.remove_temp_files([self.fpath_tmp, self.fpath_journal])
 
     def add_task(self, description, importance, cost):
         """Add a new task at the current time with the specified
@@ -91,125 +810,400 @@ class Todo(object):
             cost : float
                 In the range of value_minmax, with higher being more
                 time consuming
+
+        Returns
+        -------
+        Id of the new task
         """
-        newtask = pd.Series({
-            'datetime': pd.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), # task creation timestamp
+        newtask = {
+            'datetime': pd.Timestamp.now().strftime(self.datetime_format), # task creation timestamp
             'description': description,
             'importance': importance,
             'cost': cost,
             'priority': importance / cost,
             'completed': False,
-        })
+        }
         # this will create a new dataframe, and lose the index ordering in the process:
         #self.df = self.df.append(newtask, ignore_index=True)
-        self.df.loc[len(self.df)] = newtask
-        self.sort_list()
-        self.save()
+        # ids of a list without metadata are only known once it is loaded
+        self.wait_loaded()
+        with self._journal_session(), self.lock:
+            task_id = self.next_id
+            self._record('add', task_id, task=newtask)
+        self._edited()
+        return task_id
+
+    def add_tasks(self, tasks, chunksize=10000):
+        """Add many tasks at once, sorting and saving only at the end
+
+        Parameters
+        ----------
+        tasks : iterable
+            Dicts with `description`, `importance` and `cost` keys, or
+            dataframes with those columns (e.g., the chunks from
+            `read_task_file`). Optional `datetime` and `completed` values
+            default to the current time and False, respectively.
+        chunksize : int, optional
+            Number of dicts to convert to a dataframe at a time
+
+        Returns
+        -------
+        Number of tasks added
+        """
+        now = pd.Timestamp.now().strftime(self.datetime_format)
+        chunks = []
+        rows = []
+        for task in tasks:
+            if isinstance(task, pd.DataFrame):
+                chunks.append(self._prepare_tasks(task, now))
+            else:
+                rows.append(task)
+                if len(rows) == chunksize:
+                    chunks.append(self._prepare_tasks(pd.DataFrame(rows), now))
+                    rows = []
+        if len(rows) > 0:
+            chunks.append(self._prepare_tasks(pd.DataFrame(rows), now))
+        if len(chunks) == 0:
+            return 0
+        newtasks = pd.concat(chunks, ignore_index=True)
+        newtasks['completed'] = \
+                newtasks['completed'].dt.strftime(self.datetime_format)
+        self.wait_loaded()
+        with self._journal_session(), self.lock:
+            self._record('extend', self.next_id,
+                         tasks=newtasks.to_dict('list'))
+            self.sort_list()
+        self._edited()
+        return len(newtasks)
+
+    def _prepare_tasks(self, chunk, now):
+        """Fill in and compute the remaining columns for a chunk of new
+        tasks
+        """
+        missing = [col for col in ('description','importance','cost')
+                   if col not in chunk.columns]
+        if len(missing) > 0:
+            raise ValueError('New tasks are missing '+', '.join(missing))
+        chunk = chunk.copy()
+        chunk['description'] = chunk['description'].fillna('').astype(str)
+        chunk['importance'] = pd.to_numeric(chunk['importance'])
+        chunk['cost'] = pd.to_numeric(chunk['cost'])
+        chunk['priority'] = chunk['importance'] / chunk['cost']
+        # tasks without a value (e.g., dicts without the key) get the
+        # default, too
+        if 'datetime' not in chunk.columns:
+            chunk['datetime'] = now
+        # stored as text, so other sources (e.g., timestamps) are converted
+        chunk['datetime'] = pd.to_datetime(chunk['datetime'].fillna(now)) \
+                .dt.strftime(self.datetime_format)
+        if 'completed' not in chunk.columns:
+            chunk['completed'] = pd.NaT
+        chunk['completed'] = self._parse_completed(chunk['completed'])
+        return chunk[list(self.todo_columns)]
+
+    def archive(self, age='30D'):
+        """Move tasks that were completed more than `age` ago into the
+        archive next to the todo list (see yatl.archive)
+
+        Parameters
+        ----------
+        age : str or timedelta-like, optional
+            Minimum time since completion, e.g., '30D'
+
+        Returns
+        -------
+        Number of archived tasks
+        """
+        cutoff = pd.Timestamp.now() - pd.Timedelta(age)
+        self.wait_loaded()
+        with self.lock:
+            old = self.df.loc[self.df['completed'] < cutoff]
+        if len(old) == 0:
+            return 0
+        # the archive is written before the tasks are removed from the
+        # list, so that a crash cannot lose them
+        self.get_archive().append(old)
+        self._record('archive', labels=old.index.tolist())
+        if self._search is not None:
+            self._search.update_archive(self.get_archive())
+        self._edited()
+        return len(old)
+
+    def get_archive(self):
+        from yatl.archive import Archive
+        return Archive(self.fpath)
+
+    def archived(self, start=None, end=None):
+        """Load archived tasks completed between `start` and `end`,
+        reading only the archive partitions that are needed
+        """
+        return self.get_archive().query(start, end)
+
+    def search_index(self):
+        """Return the full-text search index (see yatl.search), loading
+        the saved index or building it the first time it is needed
+        """
+        self.wait_loaded()
+        with self.lock:
+            if self._search is None:
+                search = None
+                signature = file_signature(self.fpath)
+                if self._unchanged:
+                    search = SearchIndex.load(self.fpath_index, signature)
+                updated = search is None
+                if updated:
+                    with stats.timer('build search index'):
+                        search = SearchIndex.build(self.df['description'])
+                updated |= search.update_archive(self.get_archive())
+                if updated and self._unchanged and (signature is not None):
+                    # save right away, since read-only uses of the list
+                    # never compact it
+                    with stats.timer('write search index'):
+                        search.save(self.fpath_index, signature)
+                self._search = search
+            return self._search
+
+    @stats.timed('search')
+    def search(self, query):
+        """Find the tasks whose descriptions contain every word in
+        `query` (case insensitive)
+
+        Returns
+        -------
+        Dataframe with the matching tasks, in the same order as review()
+        """
+        with self.lock:
+            labels = list(self.search_index().lookup(query))
+            if self._ordered or self.priority_engine.dynamic:
+                self.sort_list()
+                pos = np.sort(self.df.index.get_indexer(labels))
+                return self.df.iloc[pos]
+            df = self.df.loc[labels]
+            return df.iloc[self._rank_order(df, df['priority'].values)]
+
+    @stats.timed('search archive')
+    def search_archived(self, query):
+        """Find archived tasks whose descriptions contain every word in
+        `query`, reading only the archive partitions with matches
+
+        Returns
+        -------
+        Dataframe with the matching tasks, labeled by task id
+        """
+        hits = self.search_index().lookup_archived(query)
+        archive = self.get_archive()
+        matches = [archive.read_partition(key).iloc[rows]
+                   for key,rows in hits.items()]
+        if len(matches) == 0:
+            return self._empty_frame()
+        return pd.concat(matches)
+
+    def report(self, freq='W', archived=True):
+        """Compute productivity metrics (see yatl.report)
+
+        Parameters
+        ----------
+        freq : str, optional
+            Period for the metrics over time, e.g., 'D' or 'W'
+        archived : bool, optional
+            Include archived tasks
+
+        Returns
+        -------
+        Dict with a `summary` series and dataframes of metrics per period
+        """
+        from yatl.report import productivity_report
+        self.wait_loaded()
+        df = self.df
+        if archived:
+            df = pd.concat([df, self.archived()])
+        return productivity_report(df, self.value_minmax, freq)
 
     def get_completion_datetime(self, i):
-        try:
-            return pd.to_datetime(self.df.loc[i,'completed'])
-        except (ValueError, TypeError):
+        self.wait_loaded()
+        completed_on = self.df.at[i,'completed']
+        if pd.isna(completed_on):
             return None
+        return completed_on
 
     def delete_task(self, i):
         """Delete task"""
-        self.df.drop(labels=i, axis=0, inplace=True)
-        self.save()
+        self.wait_loaded()
+        if i not in self.df.index:
+            raise KeyError(i)
+        self._record('delete', i)
+        self._edited()
 
     def mark_complete(self, i):
         """Mark task as completed with the current datetime"""
         completed_on = self.get_completion_datetime(i)
         if completed_on is None:
-            self.df.loc[i,'completed'] = pd.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            self.save()
+            self._record('complete', i,
+                         completed=pd.Timestamp.now().strftime(self.datetime_format))
+            self._edited()
         else:
             print('Task',i,'already completed:')
             print(self.df.loc[i])
 
-    def _plot_offset(self, frac=0.05):
-        maxdisp = frac * (self.value_minmax[1] - self.value_minmax[0])
-        return maxdisp * (2*np.random.random_sample() - 1)
+    def mark_incomplete(self, i):
+        """Clear the completion datetime of a task"""
+        self.wait_loaded()
+        if i not in self.df.index:
+            raise KeyError(i)
+        self._record('incomplete', i)
+        self._edited()
+
+    def incomplete_mask(self):
+        """Boolean array that is True for incomplete tasks, cached until
+        the next edit
+        """
+        self.wait_loaded()
+        if self._incomplete is None:
+            self._incomplete = self.df['completed'].isna().values
+        return self._incomplete
+
+    @stats.timed('top')
+    def top(self, n, include_completed=False):
+        """Select the `n` highest-priority tasks without sorting the whole
+        list
+
+        The candidates are narrowed down with a partial selection on
+        priority (including any ties with the n-th task), and only those
+        are sorted by the full sort key.
+
+        Returns
+        -------
+        Dataframe with up to `n` tasks, in the same order as review()
+        """
+        if include_completed:
+            self.wait_loaded()
+            candidates = None
+        else:
+            candidates = np.flatnonzero(self.incomplete_mask())
+        score = None
+        if self.priority_engine.dynamic:
+            score = self.scores()
+        return self._select_top(self.df, n, candidates, score)
+
+    @classmethod
+    def _select_top(cls, df, n, candidates=None, score=None):
+        """Select the `n` highest-priority rows from the candidate
+        positions (all rows by default), ranked by the priority column or
+        the given scores, see top()
+        """
+        if candidates is None:
+            candidates = np.arange(len(df))
+        if score is None:
+            score = df['priority'].values
+        if n < len(candidates):
+            priority = score[candidates]
+            if n <= 0:
+                return df.iloc[:0]
+            nth = np.argpartition(-priority, n-1)[:n]
+            threshold = priority[nth].min()
+            candidates = candidates[priority >= threshold]
+        # stable sort, so that ties keep the same order as in sort_list()
+        df = df.iloc[candidates]
+        order = cls._rank_order(df, score[candidates])
+        return df.iloc[order[:n]]
+
+    def _plot_offset(self, size, frac=0.05, rng=None):
+        return plotting.plot_offset(self.value_minmax, size, frac, rng)
 
+    @stats.timed('render review')
     def review(self):
         """Print the current todo list, sorted by priority and
         importance. 
+
+        While a sorted snapshot is being loaded progressively, the first
+        screen of tasks is printed as soon as the first chunk is read.
         """
-        for i,task in self.df.iterrows():
-            completed_on = self.get_completion_datetime(i)
-            if completed_on is None:
-                # task incomplete
-                labelcolor = 'r'
-                labelstr = '{:d} : {:s}'.format(i, task['description'])
-                style = dict(marker=r'${:s}$'.format(self.incomplete_mark),
-                             color=labelcolor, label=labelstr)
-                print('[ ] {:s}'.format(labelstr))
-            else:
-                # task completed
-                labelcolor = 'g'
-                labelstr = '{:d} : {:s}, completed {:s}'.format(
-                        i, task['description'], str(completed_on))
-                style = dict(marker=r'${:s}$'.format(self.complete_mark),
-                             color=labelcolor, label=labelstr)
-                print('[{:s}] {:s}'.format(self.complete_mark,labelstr))
-
-    def plot(self,fig=None,ax=None,legend=True):
+        nshown = 0
+        if (not self.loaded.is_set()) and self.preview_exact:
+            self.preview_ready.wait()
+            lines = self.review_lines(self.preview)
+            if len(lines) > 0:
+                print('\n'.join(lines), flush=True)
+            nshown = len(lines)
+        lines = self.review_lines()[nshown:]
+        if len(lines) > 0:
+            print('\n'.join(lines))
+
+    def review_lines(self, df=None):
+        """Format all tasks (or the tasks in the given subset of the
+        dataframe) for review in a single vectorized pass
+        """
+        if df is None:
+            self.sort_list()
+            df = self.df
+        done = df['completed'].notna().values
+        checkbox = np.where(done, '[{:s}] '.format(self.complete_mark),
+                            '[ ] ').astype(object)
+        lines = checkbox + self._task_labels(df)
+        return lines.tolist()
+
+    def _task_labels(self, df):
+        """Return an object array of task labels, including the
+        completion datetime for completed tasks
+        """
+        completed = df['completed'].values
+        done = ~np.isnat(completed)
+        labels = np.array(list(map(str, df.index)), dtype=object)
+        descriptions = df['description'].fillna('').values
+        # ISO-format timestamps have a fixed width, so the 'T' separator
+        # can be overwritten in place through a character view
+        stamps = np.datetime_as_string(completed[done], unit='s')
+        if len(stamps) > 0:
+            stamps.view('U1').reshape(len(stamps),-1)[:,10] = ' '
+        suffix = np.full(len(done), '', dtype=object)
+        suffix[done] = ', completed ' + stamps.astype(object)
+        return labels + ' : ' + descriptions + suffix
+
+    @stats.timed('render plot')
+    def plot(self,fig=None,ax=None,legend=True,seed=None):
         """Make a scatterplot of the current tasks on time vs
         importance axes.
+
+        Tasks are drawn as one scatter collection per completion state.
+        Above `plot_density_threshold` tasks, the number of tasks in each
+        cell of the importance/cost grid is drawn instead. The legend
+        lists at most `legend_max` tasks, in priority order. Set `seed`
+        to make the offsets that separate overlapping tasks reproducible.
         """
         showplot = False
         if (fig is None) or (ax is None):
             showplot = True
+            plt = plotting.import_pyplot()
             fig,ax = plt.subplots(figsize=(10,4))
-        # loop over tasks, checking for completion
-        for i,task in self.df.iterrows():
-            completed_on = self.get_completion_datetime(i)
-            if completed_on is None:
-                # task incomplete
-                labelcolor = 'r'
-                labelstr = '{:d} : {:s}'.format(i, task['description'])
-                style = dict(marker=r'${:s}$'.format(self.incomplete_mark),
-                             color=labelcolor, label=labelstr)
-            else:
-                # task completed
-                labelcolor = 'g'
-                labelstr = '{:d} : {:s}, completed {:s}'.format(
-                        i, task['description'], str(completed_on))
-                style = dict(marker=r'${:s}$'.format(self.complete_mark),
-                             color=labelcolor, label=labelstr)
-            # add offset to prevent tasks from perfectly overlapping on plot
-            xloc = task['cost'] + self._plot_offset()
-            yloc = task['importance'] + self._plot_offset()
-            ax.plot(xloc, yloc, ls='none', **style)
-        # update formatting
-        expanded_range = (self.value_minmax[0] - 0.25,
-                          self.value_minmax[1] + 0.25)
-        value_split = np.mean(self.value_minmax)
-        ax.axhline(value_split, ls='-', color='k')
-        ax.axvline(value_split, ls='-', color='k')
-        bkg_props = {
-            'color': '0.7',
-            'fontfamily': 'sans-serif',
-            'fontsize': 'xx-large',
-            'horizontalalignment': 'left',
-            'verticalalignment': 'top',
-            'transform': ax.transAxes,
-        }
-        ax.text(0.05, 0.95, '1', **bkg_props)
-        ax.text(0.55, 0.95, '2', **bkg_props)
-        ax.text(0.05, 0.45, '3', **bkg_props)
-        ax.text(0.55, 0.45, '4', **bkg_props)
-        ax.set_xlim(expanded_range)
-        ax.set_ylim(expanded_range)
-        ax.set_xticks(self.value_minmax, minor=False)
-        ax.set_yticks(self.value_minmax, minor=False)
-        ax.set_xticklabels(['-','+'])
-        ax.set_yticklabels(['-','+'])
-        ax.set_xlabel('time commitment')
-        ax.set_ylabel('importance')
+        self.sort_list()
+        cost = self.df['cost'].values.astype(float)
+        importance = self.df['importance'].values.astype(float)
+        done = self.df['completed'].notna().values
+        rng = None if seed is None else np.random.default_rng(seed)
+        plotting.plot_tasks(ax, cost, importance, done, self.value_minmax,
+                            self.plot_styles, self.plot_density_threshold,
+                            rng=rng)
+        self.plot_background(ax)
         if legend:
-            ax.legend(loc='upper left', bbox_to_anchor=(1.05,1))
+            handles, labels = self._legend_entries()
+            ax.legend(handles, labels,
+                      loc='upper left', bbox_to_anchor=(1.05,1))
         fig.tight_layout()
         if showplot:
             plt.show()
 
+    def plot_background(self, ax):
+        """Draw the static parts of the plot (see
+        yatl.plotting.plot_background)
+        """
+        plotting.plot_background(ax, self.value_minmax)
+
+    def _legend_entries(self):
+        """Create legend handles and labels for up to `legend_max` tasks,
+        noting how many tasks were left out
+        """
+        df = self.df.iloc[:self.legend_max]
+        return plotting.legend_entries(df['completed'].notna().values,
+                                       self._task_labels(df).tolist(),
+                                       len(self.df) - len(df),
+                                       self.plot_styles)
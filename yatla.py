@@ -24,8 +24,8 @@ path to a cloud-backed-up location.
 # Start here
 #
 if __name__ == '__main__':
+    import sys
     import argparse
-    from yatl.todo import Todo
 
     parser = argparse.ArgumentParser(
         prog='Yet Another Todo List Application',
@@ -36,12 +36,190 @@ if __name__ == '__main__':
                         help='Path to YATL todo list [default: {:s}]'.format(YATL_PATH))
     parser.add_argument('--plot', action='store_true',
                         help='Display current tasks on time vs importance plot')
+    parser.add_argument('--plot-out', metavar='outpath', type=str,
+                        help='Save the plot to an image file (e.g., .png or'
+                             ' .svg) without opening a window; plots of'
+                             ' unchanged lists are reused from a cache')
     parser.add_argument('--gui', action='store_true', help='Launch YATL GUI')
+    parser.add_argument('--top', metavar='N', type=int,
+                        help='Only print the N highest-priority incomplete'
+                             ' tasks')
+    parser.add_argument('--search', metavar='query', type=str,
+                        help='Print tasks (including archived tasks) whose'
+                             ' descriptions contain all words in the query')
+    parser.add_argument('--report', action='store_true',
+                        help='Print productivity metrics, including archived'
+                             ' tasks, per period (see --freq)')
+    parser.add_argument('--freq', choices=['D','W','M','Q','Y'], default='W',
+                        help='Period of the --report metrics: day, week,'
+                             ' month, quarter or year [default: W]')
+    parser.add_argument('--archive', metavar='days', type=float,
+                        help='Move tasks completed more than this many days'
+                             ' ago to the archive next to the todo list')
+    parser.add_argument('--backend', choices=['dataframe','records'],
+                        default='dataframe',
+                        help='In-memory representation of the list; records'
+                             ' does not need pandas, but only supports'
+                             ' reviewing, plotting and adding, completing'
+                             ' or deleting tasks [default: dataframe]')
+    parser.add_argument('--priority', default='ratio',
+                        choices=['ratio','aging','deadline','aging+deadline'],
+                        help='How tasks are ranked: by the ratio of'
+                             ' importance to cost, plus a score that grows'
+                             ' with age and/or approaching deadlines given'
+                             ' by due:YYYY-MM-DD in the description'
+                             ' [default: ratio]')
+    parser.add_argument('--stats', action='store_true',
+                        help='Print a per-phase timing breakdown on exit'
+                             ' (or set YATL_STATS=1)')
+    parser.add_argument('--profile', metavar='outpath', type=str,
+                        help='Profile the session with cProfile, writing the'
+                             ' stats to outpath (or set YATL_PROFILE)')
+    parser.add_argument('--convert', metavar='outpath', type=str,
+                        help='Write todo list to another file, in the format'
+                             ' given by its extension (.csv or binary .yatl)')
+    parser.add_argument('--import', dest='import_path', metavar='taskfile',
+                        type=str,
+                        help='Add all tasks from a CSV or JSON-lines (.jsonl)'
+                             ' file with description, importance and cost'
+                             ' columns')
+    parser.add_argument('--add', metavar='description', type=str,
+                        help='Add a new task')
+    parser.add_argument('--importance', type=float,
+                        help='Importance of the new task [default: maximum]')
+    parser.add_argument('--cost', type=float,
+                        help='Cost of the new task [default: minimum]')
+    parser.add_argument('--complete', metavar='id', type=int,
+                        help='Mark task as completed')
+    parser.add_argument('--delete', metavar='id', type=int,
+                        help='Delete task')
+    parser.add_argument('--serve', action='store_true',
+                        help='Keep the todo list loaded and serve requests'
+                             ' from other yatla.py calls over a Unix socket')
+    parser.add_argument('--stop', action='store_true',
+                        help='Stop the daemon serving the todo list')
     args = parser.parse_args()
+    if (args.backend == 'records') and (args.gui or args.serve or args.convert
+                                        or args.import_path or args.search
+                                        or args.plot_out or args.report
+                                        or (args.archive is not None)
+                                        or (args.priority != 'ratio')):
+        parser.error('the records backend only supports reviewing, plotting'
+                     ' and adding, completing or deleting tasks, ranked'
+                     ' by the default priority')
 
-    todo = Todo(args.yatl_path)
+    from yatl import stats
+    stats.configure_from_env()
+    if args.stats:
+        stats.enable()
+    if args.profile:
+        stats.start_profile(args.profile)
 
-    if args.plot:
+    if args.add is not None:
+        req = dict(op='add', description=args.add,
+                   importance=args.importance, cost=args.cost)
+    elif args.complete is not None:
+        req = dict(op='complete', label=args.complete)
+    elif args.delete is not None:
+        req = dict(op='delete', label=args.delete)
+    elif args.stop:
+        req = dict(op='shutdown')
+    elif args.top is not None:
+        req = dict(op='top', n=args.top)
+    elif args.search is not None:
+        req = dict(op='search', query=args.search)
+    elif not (args.plot or args.plot_out or args.gui or args.convert
+              or args.import_path or args.serve or args.report
+              or (args.archive is not None)):
+        req = dict(op='review')
+    else:
+        req = None
+
+    if (req is not None) and (args.priority == 'ratio'):
+        # use the daemon serving this list, if there is one (which ranks
+        # tasks with the priority engine that it was started with)
+        from yatl import client
+        response = client.request(args.yatl_path, **req)
+        if response is not None:
+            if req['op'] == 'review':
+                print('Todo list:',args.yatl_path)
+            if response['ok']:
+                print(response['output'], end='')
+                sys.exit()
+            else:
+                sys.exit(response['error'])
+        elif args.stop:
+            if client.is_running(args.yatl_path):
+                sys.exit('The daemon serving '+args.yatl_path
+                         +' is not responding')
+            sys.exit('No daemon is serving '+args.yatl_path)
+
+    if args.plot_out:
+        from yatl.render import export_plot
+        export_plot(args.yatl_path, args.plot_out)
+        sys.exit()
+
+    if (req is not None) and (req['op'] in ('review','top')) \
+            and (args.priority == 'ratio'):
+        # review without importing pandas, if possible
+        from yatl import lite
+        if lite.can_review(args.yatl_path):
+            if req['op'] == 'top':
+                lite.top(args.yatl_path, req['n'])
+            else:
+                lite.review(args.yatl_path)
+            sys.exit()
+
+    from yatl import client
+    if client.is_running(args.yatl_path):
+        # the daemon would overwrite any changes made here when it exits,
+        # and would not see them in the meantime
+        sys.exit('A daemon is serving {:s}, which is not responding or'
+                 ' does not support this command; stop it first with'
+                 ' --stop'.format(args.yatl_path))
+
+    if args.backend == 'records':
+        from yatl.records import RecordTodo as Todo
+    else:
+        from yatl.todo import Todo
+    kwargs = dict(verbose=(args.top is None) and (args.search is None))
+    if args.gui:
+        # show the first screen of tasks while the rest of the list loads
+        kwargs['progressive'] = True
+    if args.priority != 'ratio':
+        from yatl.priority import priority_engines
+        kwargs['priority_engine'] = priority_engines[args.priority]()
+    todo = Todo(args.yatl_path, **kwargs)
+
+    if req is not None:
+        from yatl.server import run_request, edit_ops
+        print(run_request(todo, req), end='')
+        # the change journal holds the unsaved changes of a session, which
+        # can be discarded (see remove_temp), and keeps the review from
+        # taking the fast path, so edits are saved to the snapshot; edits
+        # that did not change anything are not
+        if (req['op'] in edit_ops) and todo.changed:
+            todo.save(overwrite=True)
+    elif args.serve:
+        from yatl.server import serve
+        serve(todo)
+    elif args.report:
+        from yatl.report import format_report
+        print(format_report(todo.report(freq=args.freq)))
+    elif args.archive is not None:
+        narchived = todo.archive('{:g}D'.format(args.archive))
+        print('Archived',narchived,'tasks completed more than',
+              args.archive,'days ago')
+        if narchived > 0:
+            todo.save(overwrite=True)
+    elif args.import_path:
+        from yatl.todo import read_task_file
+        ntasks = todo.add_tasks(read_task_file(args.import_path))
+        print('Imported',ntasks,'tasks from',args.import_path)
+        todo.save(overwrite=True)
+    elif args.convert:
+        todo.export(args.convert)
+    elif args.plot:
         todo.plot()
     elif args.gui:
         import tkinter as tk
@@ -50,6 +228,3 @@ if __name__ == '__main__':
         root.title('Yet Another Todo List')
         mygui = YATLApp(root, todo)
         root.mainloop()
-    else:
-        todo.review()
-